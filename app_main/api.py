@@ -6,6 +6,7 @@ os.environ["LANGSMITH_API_KEY"] = ""
 
 import asyncio
 import sys
+import threading
 from dotenv import load_dotenv
 
 # Ensure the root directory is in the path so local modules are found
@@ -13,39 +14,71 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ingestion import load_docs, embed_store, chunking
 from models import chat_models
-from rag import chain, prompt, retriever
+from rag import cache, chain, prompt, retriever
 
 
 load_dotenv()
 
-def retriever_qa(file_paths, flag):
+# One embedding model (and query-embedding cache connection) per process,
+# reused by every chain build: refreshes, index reopens and the batch CLI
+_embed_model = None
+_embed_model_lock = threading.Lock()
+
+
+def get_embeddings_model():
+    global _embed_model
+    with _embed_model_lock:
+        if _embed_model is None:
+            embed_model = chat_models.embeddings_model()
+            if cache.EMBEDDING_CACHE_ENABLED:
+                # Query embeddings come from disk for questions seen before (also across restarts)
+                embed_model = cache.CachedEmbeddings(embed_model)
+            _embed_model = embed_model
+    return _embed_model
+
+
+def retriever_qa(file_paths, flag, build_if_missing=True):
     """
     file_paths: Can be a single string or a list of strings
+    flag: True to reuse the persisted index, False to build a new index
+          from the files (written beside the active one, then swapped in)
+    build_if_missing: False to only open an existing index (worker processes
+          that do not own the refresh pipeline must never build one)
     """
     try:
-        # Step 1: Load Documents
-        # Logic check: If document_loader expects a string, we loop if a list is provided
-        all_documents = []
-        if isinstance(file_paths, list):
-            for path in file_paths:
-                # path=f"data\website_documents\{path}"
-                print(path)
-                if os.path.exists(path):
-                    all_documents.extend(load_docs.document_loader(path))
-                else:
-                    print(f"⚠️ Warning: File not found at {path}")
-        else:
-            all_documents = load_docs.document_loader(file_paths)
-
-        if not all_documents:
-            raise ValueError("No documents were loaded. Check your file paths.")
-
-        # Step 2: Split Text
-        chunks = chunking.text_splitter(all_documents)
-
-        # Step 3: Embeddings & Vector DB
-        embed_model = chat_models.embeddings_model()
-        vectordb = embed_store.vector_database(chunks, embed_model, flag)
+        embed_model = get_embeddings_model()
+
+        # Fast path: an existing index is opened directly, without re-reading
+        # and re-chunking the source documents
+        vectordb = embed_store.open_existing_database(embed_model) if flag else None
+
+        if vectordb is None and not build_if_missing:
+            raise ValueError("No usable index on disk yet")
+
+        if vectordb is None:
+            # Step 1: Load Documents
+            # Logic check: If document_loader expects a string, we loop if a list is provided
+            all_documents = []
+            if isinstance(file_paths, list):
+                for path in file_paths:
+                    # path=f"data\website_documents\{path}"
+                    print(path)
+                    if os.path.exists(path):
+                        all_documents.extend(load_docs.document_loader(path))
+                    else:
+                        print(f"⚠️ Warning: File not found at {path}")
+            else:
+                all_documents = load_docs.document_loader(file_paths)
+
+            if not all_documents:
+                raise ValueError("No documents were loaded. Check your file paths.")
+
+            # Step 2: Split Text
+            chunks = chunking.text_splitter(all_documents)
+
+            # Step 3: Embeddings & Vector DB
+            fingerprint = embed_store.source_fingerprint(file_paths if isinstance(file_paths, list) else [file_paths])
+            vectordb = embed_store.vector_database(chunks, embed_model, flag, fingerprint)
 
         # Step 4: Retriever
         retrievers = retriever.get_retriever(vectordb)
@@ -57,6 +90,11 @@ def retriever_qa(file_paths, flag):
         # Step 6: QA Chain
         qa_chain = chain.rag_chain(retrievers, prompt_template, chat_model)
 
+        # Step 7: Semantic cache in front of the chain (answers paraphrased queries)
+        if cache.SEMANTIC_CACHE_ENABLED:
+            semantic_cache = cache.SemanticCache(embed_model)
+            qa_chain = cache.SemanticCacheRunnable(qa_chain, semantic_cache)
+
         return qa_chain
 
     except Exception as e:
@@ -0,0 +1,245 @@
+"""
+Static asset pipeline for the web frontend.
+
+    python -m app_main.assets
+
+writes static/dist/ with content-hashed copies of styles.css and script.js
+(plus .gz / .br precompressed files), resized AVIF / WebP / JPEG variants of
+the background image, a manifest.json and an index.html pointing at them.
+AssetStaticFiles serves those with immutable caching and the precompressed
+copies when the browser accepts them. Without a build the original files are
+served as before.
+"""
+import os
+import re
+import gzip
+import json
+import stat
+import shutil
+import hashlib
+import mimetypes
+
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+try:
+    from PIL import Image, features
+except ImportError:  # images are then left as they are
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # gzip copies only
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_FILE = os.path.join(DIST_DIR, "manifest.json")
+STATIC_URL = "/static"
+
+BACKGROUND_IMAGE = "muet-bg.jpg"
+# Widths generated for the background; the CSS picks one per viewport
+BACKGROUND_WIDTHS = (768, 1280, 1920)
+AVIF_QUALITY = 50
+WEBP_QUALITY = 75
+JPEG_QUALITY = 78
+TEXT_ASSETS = ("styles.css", "script.js")
+HASH_LENGTH = 10
+
+# Hashed names change with their content, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else is revalidated with its ETag on each use
+REVALIDATE_CACHE_CONTROL = "no-cache"
+HASHED_NAME = re.compile(r"\.[0-9a-f]{%d}\.[a-z0-9]+$" % HASH_LENGTH)
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+# ============================================================
+# Build
+# ============================================================
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{content_hash(data)}{ext}"
+
+
+def write_asset(name: str, data: bytes, compress: bool = False) -> str:
+    """Write data to dist under a content-hashed name, returning that name"""
+    filename = hashed_name(name, data)
+    path = os.path.join(DIST_DIR, filename)
+    with open(path, "wb") as f:
+        f.write(data)
+    if compress:
+        # mtime=0 keeps the .gz byte-identical across builds
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+    return filename
+
+
+def build_background(manifest):
+    """Resized AVIF/WebP/JPEG variants of the background; returns {width: {format: name}}"""
+    source = os.path.join(STATIC_DIR, BACKGROUND_IMAGE)
+    if Image is None or not os.path.exists(source):
+        print("⚠️ Pillow not installed or background missing; skipping image variants")
+        return {}
+
+    formats = [("webp", "WEBP", {"quality": WEBP_QUALITY, "method": 6}),
+               ("jpg", "JPEG", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True})]
+    if features.check("avif"):
+        formats.insert(0, ("avif", "AVIF", {"quality": AVIF_QUALITY}))
+
+    variants = {}
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        for width in BACKGROUND_WIDTHS:
+            width = min(width, image.width)
+            if width in variants:
+                continue
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image
+            stem = f"{os.path.splitext(BACKGROUND_IMAGE)[0]}-{width}"
+            variants[width] = {}
+            for ext, pil_format, options in formats:
+                path = os.path.join(DIST_DIR, f"{stem}.{ext}")
+                resized.save(path, pil_format, **options)
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.remove(path)
+                variants[width][ext] = manifest[f"{stem}.{ext}"] = write_asset(f"{stem}.{ext}", data)
+    return variants
+
+
+def _image_set(names):
+    types = {"avif": "image/avif", "webp": "image/webp", "jpg": "image/jpeg"}
+    return "image-set(" + ", ".join(
+        f'url("{STATIC_URL}/dist/{name}") type("{types[ext]}")' for ext, name in names.items()
+    ) + ")"
+
+
+def rewrite_css(css: str, variants) -> str:
+    """Point background rules at the optimized images, smallest fitting width per viewport"""
+    if not variants:
+        return css
+
+    pattern = re.compile(r"url\(['\"]?%s/%s['\"]?\)" % (STATIC_URL, re.escape(BACKGROUND_IMAGE)))
+    selectors = [
+        re.sub(r"/\*.*?\*/", "", match.group(1), flags=re.S).strip()
+        for match in re.finditer(r"([^{}]+)\{[^{}]*%s" % pattern.pattern, css)
+    ]
+    widths = sorted(variants)
+    largest = variants[widths[-1]]
+    # Plain url() first: browsers without image-set() keep the resized JPEG
+    css = pattern.sub(f'url("{STATIC_URL}/dist/{largest["jpg"]}")', css)
+    if not selectors:
+        return css
+
+    selector = ", ".join(selectors)
+    rules = ["\n/* Generated by app_main/assets.py */",
+             f"{selector} {{ background-image: {_image_set(largest)}; }}"]
+    for width in reversed(widths[:-1]):
+        rules.append(f"@media (max-width: {width}px) {{ {selector} {{ background-image: {_image_set(variants[width])}; }} }}")
+    return css + "\n".join(rules) + "\n"
+
+
+def rewrite_html(html: str, manifest) -> str:
+    for name in TEXT_ASSETS:
+        html = re.sub(
+            r"%s/%s(\?[^\"']*)?" % (STATIC_URL, re.escape(name)),
+            f"{STATIC_URL}/dist/{manifest[name]}",
+            html,
+        )
+    return html
+
+
+def build_assets():
+    print("🔄 Building static assets...")
+    if os.path.exists(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    variants = build_background(manifest)
+
+    for name in TEXT_ASSETS:
+        with open(os.path.join(STATIC_DIR, name), "r", encoding="utf-8") as f:
+            text = f.read()
+        if name.endswith(".css"):
+            text = rewrite_css(text, variants)
+        manifest[name] = write_asset(name, text.encode("utf-8"), compress=True)
+
+    with open(os.path.join(STATIC_DIR, "index.html"), "r", encoding="utf-8") as f:
+        html = rewrite_html(f.read(), manifest)
+    with open(os.path.join(DIST_DIR, "index.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Wrote {len(manifest)} assets to {DIST_DIR}")
+    return manifest
+
+
+def index_html_path():
+    """Built index.html if the pipeline has run, else the source page"""
+    built = os.path.join(DIST_DIR, "index.html")
+    return built if os.path.exists(built) else os.path.join(STATIC_DIR, "index.html")
+
+
+# ============================================================
+# Serving
+# ============================================================
+def accepted_encodings(header: str):
+    encodings = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class AssetStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves precompressed .br/.gz copies when accepted,
+    marks content-hashed files immutable and makes the rest revalidate.
+    """
+
+    async def get_response(self, path, scope):
+        response = None
+        encoding = None
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for name, suffix in PRECOMPRESSED:
+            if name not in accepted:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                encoding = name
+                break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+        elif response.status_code == 200:
+            response.headers["content-encoding"] = encoding
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if media_type.startswith("text/"):
+                media_type += "; charset=utf-8"
+            response.headers["content-type"] = media_type
+
+        if response.status_code in (200, 304):
+            if any(os.path.exists(os.path.join(str(self.directory), path + suffix)) for _, suffix in PRECOMPRESSED):
+                response.headers["vary"] = "Accept-Encoding"
+            response.headers["cache-control"] = (
+                IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path) else REVALIDATE_CACHE_CONTROL
+            )
+        return response
+
+
+if __name__ == "__main__":
+    build_assets()
@@ -0,0 +1,82 @@
+import os
+import json
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Base URL of a running main.py API server, e.g. http://localhost:8000
+MUETBOT_API_URL = os.getenv("MUETBOT_API_URL", "").rstrip("/")
+# Keep-alive connections kept open to the API server
+MUETBOT_API_POOL_SIZE = int(os.getenv("MUETBOT_API_POOL_SIZE", "10"))
+MUETBOT_API_CONNECT_TIMEOUT = float(os.getenv("MUETBOT_API_CONNECT_TIMEOUT", "5"))
+# Longest gap allowed between streamed tokens
+MUETBOT_API_READ_TIMEOUT = float(os.getenv("MUETBOT_API_READ_TIMEOUT", "120"))
+
+
+class ChatAPIError(Exception):
+    pass
+
+
+class ChatClient:
+    """
+    Client for the FastAPI backend. Its requests.Session keeps connections
+    alive between questions. A requests.Session is not thread-safe, so give
+    each user (thread) its own client; per-request headers are passed to
+    each call and the session's own headers and cookies are never changed.
+    """
+
+    def __init__(self, base_url=MUETBOT_API_URL, pool_size=MUETBOT_API_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (MUETBOT_API_CONNECT_TIMEOUT, MUETBOT_API_READ_TIMEOUT)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _error_detail(response):
+        try:
+            return response.json().get("detail", response.text)
+        except ValueError:
+            return response.text or response.reason
+
+    def stream(self, query, session_id=None):
+        """Yield answer tokens from /chat/stream; raises ChatAPIError on failure"""
+        headers = {"Accept": "text/event-stream"}
+        if session_id:
+            headers["X-Session-ID"] = session_id
+        try:
+            response = self.session.post(
+                f"{self.base_url}/chat/stream",
+                json={"query": query, "session_id": session_id},
+                headers=headers,
+                stream=True,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise ChatAPIError(f"Could not reach the MUETBOT API: {e}") from e
+
+        with response:
+            if response.status_code != 200:
+                raise ChatAPIError(self._error_detail(response))
+
+            response.encoding = "utf-8"
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):].strip())
+                    if event == "error":
+                        raise ChatAPIError(data.get("detail", "Failed to get response"))
+                    if data.get("token"):
+                        yield data["token"]
+                elif not line:
+                    event = None
+
+    def clear_session(self, session_id):
+        try:
+            self.session.delete(f"{self.base_url}/chat/session/{quote(session_id, safe='')}", timeout=self.timeout)
+        except requests.RequestException:
+            pass
@@ -0,0 +1,150 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; maps to HTTP 429"""
+
+    def __init__(self, detail, retry_after):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+
+# ============================================================
+# Admission Control (bounded in-flight work + bounded queue)
+# ============================================================
+class AdmissionController:
+    """
+    At most max_inflight chain runs execute at once and at most max_queue
+    wait for a slot. Work beyond that is rejected up front instead of piling
+    up, so admitted requests keep a predictable latency.
+    """
+
+    def __init__(self, max_inflight, max_queue, queue_timeout):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._semaphore = asyncio.Semaphore(max_inflight)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        # Moving average of how long a chain run holds its slot
+        self.avg_service_seconds = 5.0
+
+    def retry_after(self):
+        """Rough time until a newly queued request would get a slot"""
+        queued_ahead = max(self.active + self.waiting - self.max_inflight, 0)
+        return self.avg_service_seconds * (queued_ahead + 1) / self.max_inflight
+
+    def check(self):
+        """Reject immediately if the queue is already full"""
+        if self.active + self.waiting >= self.max_inflight + self.max_queue:
+            self.rejected += 1
+            raise Overloaded("Server is busy, please retry shortly.", self.retry_after())
+
+    def reserve(self):
+        """Claim a queue place now (or raise Overloaded); use it with slot(reserved=True)"""
+        self.check()
+        self.waiting += 1
+
+    @asynccontextmanager
+    async def slot(self, reserved=False):
+        """Wait (bounded) for an execution slot and hold it for the block"""
+        if not reserved:
+            self.reserve()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded("Timed out waiting in the request queue.", self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            self.avg_service_seconds = 0.9 * self.avg_service_seconds + 0.1 * (time.monotonic() - start)
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+
+# ============================================================
+# Per-Client Rate Limiting (token bucket)
+# ============================================================
+class TokenBucketLimiter:
+    """
+    One token bucket per client: `burst` requests at once, refilled at
+    `rate` tokens per second. Only the most recently seen max_clients
+    buckets are kept so memory stays bounded.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self.rejected = 0
+
+    def acquire(self, client_id, cost=1.0):
+        """Take tokens for a request or raise Overloaded with the wait time"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        if tokens < cost:
+            self._buckets[client_id] = (tokens, now)
+            self.rejected += 1
+            raise Overloaded("Too many requests, please slow down.", (cost - tokens) / self.rate)
+
+        self._buckets[client_id] = (tokens - cost, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+    def stats(self):
+        return {"tracked_clients": len(self._buckets), "rejected": self.rejected}
+
+
+def _strip_port(address):
+    """"1.2.3.4:5678" -> "1.2.3.4" and "[::1]:5678" -> "::1" (Azure's front end adds the port)"""
+    if address.startswith("["):
+        return address[1:].split("]", 1)[0]
+    if address.count(":") == 1:
+        return address.split(":", 1)[0]
+    return address
+
+
+def client_id(request, trusted_proxy_hops=0):
+    """
+    Rate-limit key for a request: the client IP. Headers the client controls
+    (X-Session-ID, the left of X-Forwarded-For) are never used, or a client
+    could get a fresh bucket by sending a new value. Behind trusted_proxy_hops
+    reverse proxies, the address the outermost trusted proxy saw is the
+    X-Forwarded-For entry that many hops from the right.
+    """
+    if trusted_proxy_hops > 0:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(hops) >= trusted_proxy_hops:
+            return f"ip:{_strip_port(hops[-trusted_proxy_hops])}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def is_quota_error(error):
+    """True for upstream (Gemini) rate-limit / quota errors"""
+    text = f"{type(error).__name__} {error}".lower()
+    return "resourceexhausted" in text or "429" in text or "quota" in text or "rate limit" in text
@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import deque
+
+from rag.metrics import estimate_tokens
+
+# Token budget for the whole history block sent to the prompt
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "600"))
+# Turns kept verbatim; older ones are folded into the rolling summary
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "3"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "200"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "5000"))
+# Sessions are kept in SQLite so every gunicorn worker sees every conversation
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join("ingestion", "vector_db", "sessions.sqlite3"))
+
+# Stored turn text is clipped so one long answer cannot blow the budget
+MAX_QUESTION_CHARS = 400
+MAX_ANSWER_CHARS = 800
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def _gist(answer):
+    """First sentence of an answer, without markdown decoration"""
+    text = re.sub(r"[*#_`>]+", "", answer)
+    text = re.sub(r"^\s*(Summary|Details)\s*:\s*", "", text.strip(), flags=re.IGNORECASE)
+    sentence = re.split(r"(?<=[.!?])\s|\n", text.strip(), maxsplit=1)[0]
+    return _clip(sentence, 200)
+
+
+class ConversationHistory:
+    """
+    History of one conversation within a fixed token budget: the last few
+    turns verbatim plus a rolling extractive summary of older turns. Older
+    summary lines are dropped once the summary exceeds its own budget, so
+    memory per conversation is bounded no matter how long it runs.
+    """
+
+    def __init__(self, token_budget=SESSION_HISTORY_TOKENS, recent_turns=SESSION_RECENT_TURNS,
+                 summary_tokens=SESSION_SUMMARY_TOKENS):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.turns = deque()
+        self.summary = deque()
+
+    def __bool__(self):
+        return bool(self.turns or self.summary)
+
+    def add_turn(self, question, answer):
+        self.turns.append((_clip(question, MAX_QUESTION_CHARS), _clip(answer, MAX_ANSWER_CHARS)))
+        self._compact()
+
+    def _compact(self):
+        while self.turns and (
+            len(self.turns) > self.recent_turns
+            or (len(self.turns) > 1 and estimate_tokens(self.render()) > self.token_budget)
+        ):
+            question, answer = self.turns.popleft()
+            self.summary.append(f"- Asked: {_clip(question, 160)} -> {_gist(answer)}")
+            while len(self.summary) > 1 and estimate_tokens("\n".join(self.summary)) > self.summary_tokens:
+                self.summary.popleft()
+
+    def to_json(self):
+        return json.dumps({"turns": list(self.turns), "summary": list(self.summary)})
+
+    @classmethod
+    def from_json(cls, data):
+        history = cls()
+        state = json.loads(data)
+        history.turns = deque(tuple(turn) for turn in state.get("turns", []))
+        history.summary = deque(state.get("summary", []))
+        return history
+
+    def render(self):
+        """History block for the prompt ("" for a new conversation)"""
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(self.summary))
+        for question, answer in self.turns:
+            parts.append(f"User: {question}\nAssistant: {answer}")
+        return "\n\n".join(parts)
+
+
+class SessionStore:
+    """
+    Server-side conversations keyed by session id, stored in a SQLite file
+    shared by all worker processes (WAL mode, so readers never wait on a
+    writer). Sessions with no new turn for idle_seconds are evicted, and at
+    most max_sessions are kept (least recently active first out). Methods
+    block on SQLite; call them from async code through asyncio.to_thread.
+    """
+
+    # How often (in writes) the size limit is enforced
+    TRIM_EVERY = 64
+
+    def __init__(self, path=SESSION_STORE_PATH, max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit; add_turn opens its own write transaction
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, history TEXT NOT NULL, last_active REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active)")
+        self._writes = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def _load(self, session_id, now):
+        row = self._db.execute(
+            "SELECT history FROM sessions WHERE id = ? AND last_active >= ?",
+            (session_id, now - self.idle_seconds),
+        ).fetchone()
+        return ConversationHistory.from_json(row[0]) if row else None
+
+    def history(self, session_id):
+        """Rendered history for the session ("" if unknown, idle or empty)"""
+        try:
+            with self._lock:
+                history = self._load(session_id, time.time())
+        except (sqlite3.Error, ValueError) as e:
+            print(f"⚠️ Session store read failed: {e}")
+            return ""
+        return history.render() if history is not None else ""
+
+    def add_turn(self, session_id, question, answer):
+        now = time.time()
+        try:
+            with self._lock:
+                # IMMEDIATE: a concurrent turn from another worker waits instead of being lost
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    history = self._load(session_id, now) or ConversationHistory()
+                    history.add_turn(question, answer)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions (id, history, last_active) VALUES (?, ?, ?)",
+                        (session_id, history.to_json(), now),
+                    )
+                    self._writes += 1
+                    if self._writes % self.TRIM_EVERY == 0:
+                        self._evict(now)
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+        except (sqlite3.Error, ValueError) as e:
+            print(f"⚠️ Session store write failed: {e}")
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM sessions WHERE last_active < ?", (now - self.idle_seconds,))
+        self._db.execute(
+            "DELETE FROM sessions WHERE id IN ("
+            "SELECT id FROM sessions ORDER BY last_active DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    def clear(self, session_id):
+        try:
+            with self._lock:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        except sqlite3.Error as e:
+            print(f"⚠️ Session store write failed: {e}")
+
+    def stats(self):
+        return {"active_sessions": len(self), "max_sessions": self.max_sessions}
@@ -11,34 +11,122 @@ warnings.filterwarnings("ignore")
 # =========================
 # Imports
 # =========================
-import gradio as gr
-from app import api
+import sys
+import threading
+
+import gradio as gr  # internal testing UI (gradio in requirements.txt), not needed by the API server
+
+# Run as `python -m app_main.ui` or `python app_main/ui.py` from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_main.api import retriever_qa
+from app_main.sessions import ConversationHistory
+
+# =========================
+# Configuration
+# =========================
+OUTPUT_FILE = os.path.join("data", "website_documents", "muet_data.txt")
+NEWS_FILE = os.path.join("data", "website_documents", "muet_circular_data.txt")
+
+# Questions answered at the same time; the rest wait in Gradio's queue
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "8"))
+# Waiting requests beyond this are turned away instead of queuing forever
+GRADIO_MAX_QUEUE = int(os.getenv("GRADIO_MAX_QUEUE", "64"))
+GRADIO_HOST = os.getenv("GRADIO_HOST", "127.0.0.1")
+GRADIO_PORT = int(os.getenv("GRADIO_PORT", "7870"))
+
+# =========================
+# QA Chain (built once, shared by all users)
+# =========================
+qa_chain = None
+_chain_lock = threading.Lock()
+
+
+def get_qa_chain():
+    """Same chain as the API server, opened from the persisted index"""
+    global qa_chain
+    with _chain_lock:
+        if qa_chain is None:
+            qa_chain = retriever_qa([OUTPUT_FILE, NEWS_FILE], flag=True)
+    return qa_chain
+
+
+def _text(content):
+    """Plain text of a Gradio chat message (string or list of content parts)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict):
+        return content.get("text", "")
+    if isinstance(content, (list, tuple)):
+        return " ".join(_text(part) for part in content)
+    return ""
+
+
+def history_from_messages(messages):
+    """
+    Bounded, compacted history from the Chatbot's messages. Accepts the
+    messages format ({"role", "content"} dicts, the only one in Gradio 6)
+    and Gradio 5's default tuple format ([user, bot] pairs).
+    """
+    history = ConversationHistory()
+    question = None
+    for message in messages or []:
+        if isinstance(message, (list, tuple)):
+            user, bot = (list(message) + [None, None])[:2]
+            if user is not None and bot is not None:
+                history.add_turn(_text(user), _text(bot))
+            continue
+        if message.get("role") == "user":
+            question = _text(message.get("content"))
+        elif message.get("role") == "assistant" and question is not None:
+            history.add_turn(question, _text(message.get("content")))
+            question = None
+    return history.render()
+
+
+async def respond(message, messages):
+    """Stream the answer into the chat as Gemini generates it"""
+    chain = qa_chain
+    if chain is None:
+        yield "⚠️ Chatbot is not initialized. Please restart the UI."
+        return
+
+    answer = ""
+    try:
+        async for chunk in chain.astream({"question": message, "history": history_from_messages(messages)}):
+            answer += chunk
+            yield answer
+    except Exception as e:
+        yield f"{answer}\n\n⚠️ Error: {str(e)}"
+
 
 # =========================
 # Gradio Interface
 # =========================
-file_path='data\muet_news_data.txt'
-rag_application = gr.Interface(
-    fn=api.retriever_qa(file_path),
-    inputs=[
-       
-        gr.Textbox(
-            label="Your Question",
-            placeholder="Ask something from the document...",
-            lines=2
-        ),
+rag_application = gr.ChatInterface(
+    fn=respond,
+    title="🎓 MUET Assistant",
+    description="Ask about admissions, programs, departments, news, events and jobs at MUET.",
+    examples=[
+        "What are the admission requirements?",
+        "What are the latest news?",
+        "What are the latest job openings?",
     ],
-    outputs=gr.Textbox(label="Answer"),
-    title="📄 PDF Question Answering Bot",
-    description="Upload a PDF and ask questions using Watsonx + LangChain.",
-    allow_flagging="never",
+    cache_examples=False,
+    flagging_mode="never",
+    concurrency_limit=GRADIO_CONCURRENCY,
 )
+rag_application.queue(max_size=GRADIO_MAX_QUEUE, default_concurrency_limit=GRADIO_CONCURRENCY)
 
 # =========================
 # Launch App
 # =========================
 if __name__ == "__main__":
+    print("🔄 Initializing MUET Chatbot...")
+    if get_qa_chain() is None:
+        print("❌ Failed to initialize QA Chain. Exiting.")
+        sys.exit(1)
     rag_application.launch(
-        server_name="127.0.0.1",
-        server_port=7870,
+        server_name=GRADIO_HOST,
+        server_port=GRADIO_PORT,
     )
@@ -4,7 +4,9 @@ def text_splitter(documents):
     splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
+            separators=["\n\n", "\n", " ", ""],
+            # start_index gives every chunk a stable id within its source
+            add_start_index=True
         )
     chunks = splitter.split_documents(documents)
 
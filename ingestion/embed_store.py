@@ -1,39 +1,158 @@
 import os
+import time
+import uuid
+import shutil
+import hashlib
 from langchain_community.vectorstores import Chroma
 from dotenv import load_dotenv
 load_dotenv()
-def vector_database(chunks,embeddings,flag):
+
+VECTOR_DB_DIR = "ingestion/vector_db"
+DB_PATH = os.path.join(VECTOR_DB_DIR, "muet_chroma_db")
+# Name of the active index directory. Rebuilds are written to a fresh
+# directory and this pointer is swapped atomically afterwards.
+CURRENT_POINTER = os.path.join(VECTOR_DB_DIR, "CURRENT")
+# Superseded index directories kept around for readers still using them
+KEEP_OLD_INDEXES = int(os.getenv("KEEP_OLD_INDEXES", "2"))
+
+# Marker rewritten every time the index is (re)built; caches compare against it
+INDEX_VERSION_NAME = "index_version.txt"
+SOURCE_FINGERPRINT_NAME = "source_fingerprint.txt"
+# Bump when the chunk metadata written at ingestion changes, so that an
+# index built by older code is rebuilt even if the sources are unchanged
+# (2: source_type tag on every chunk, 3: news split per article with publish dates)
+INGESTION_VERSION = "3"
+
+
+def current_db_path():
+    """Directory of the active index"""
+    try:
+        with open(CURRENT_POINTER, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+        if name and os.path.exists(os.path.join(VECTOR_DB_DIR, name)):
+            return os.path.join(VECTOR_DB_DIR, name)
+    except FileNotFoundError:
+        pass
+    return DB_PATH
+
+
+def _read_marker(db_path, name):
+    try:
+        with open(os.path.join(db_path, name), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def index_version():
+    """Return the version id of the current on-disk index ("" if unknown)"""
+    return _read_marker(current_db_path(), INDEX_VERSION_NAME)
+
+
+def index_source_fingerprint():
+    """Fingerprint of the source files the current index was built from"""
+    return _read_marker(current_db_path(), SOURCE_FINGERPRINT_NAME)
+
+
+def source_fingerprint(file_paths):
+    """Content hash of the source files, used to skip rebuilds when nothing changed"""
+    digest = hashlib.sha256()
+    digest.update(INGESTION_VERSION.encode("utf-8"))
+    for path in file_paths:
+        digest.update(path.encode("utf-8"))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def mark_index_rebuilt(db_path=DB_PATH, fingerprint=""):
+    """Give the index a new version id so that dependent caches are invalidated"""
+    os.makedirs(db_path, exist_ok=True)
+    version = uuid.uuid4().hex
+    with open(os.path.join(db_path, INDEX_VERSION_NAME), "w", encoding="utf-8") as f:
+        f.write(version)
+    if fingerprint:
+        with open(os.path.join(db_path, SOURCE_FINGERPRINT_NAME), "w", encoding="utf-8") as f:
+            f.write(fingerprint)
+    return version
+
+
+def _swap_current(db_path):
+    """Atomically point CURRENT at db_path, then prune old index directories"""
+    tmp_pointer = CURRENT_POINTER + ".tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(db_path))
+    os.replace(tmp_pointer, CURRENT_POINTER)
+
+    old_indexes = sorted(
+        name for name in os.listdir(VECTOR_DB_DIR)
+        if name.startswith("muet_chroma_db_") and name != os.path.basename(db_path)
+    )
+    for name in old_indexes[:max(len(old_indexes) - KEEP_OLD_INDEXES, 0)]:
+        shutil.rmtree(os.path.join(VECTOR_DB_DIR, name), ignore_errors=True)
+
+
+def build_new_database(chunks, embeddings, fingerprint=""):
+    """
+    Build a complete index in a fresh directory and make it the active one.
+    Anything still reading the previous index keeps working until it reopens.
+    """
+    db_path = os.path.join(
+        VECTOR_DB_DIR, f"muet_chroma_db_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    )
+    print(f"--- Creating NEW database in {db_path} (This will call Gemini API) ---")
+    vectordb = Chroma.from_documents(
+        documents=chunks,
+        embedding=embeddings,
+        persist_directory=db_path
+    )
+    mark_index_rebuilt(db_path, fingerprint)
+    _swap_current(db_path)
+    print(f"--- Database saved locally with {vectordb._collection.count()} documents! ---")
+    return vectordb
+
+
+def open_existing_database(embeddings):
+    """
+    Open the persisted index without touching the source documents.
+    Returns None if there is no usable (non-empty) index on disk.
+    """
+    db_path = current_db_path()
+    if not os.path.exists(db_path):
+        return None
+
+    print(f"--- Opening existing database at {db_path} ---")
+    vectordb = Chroma(
+        persist_directory=db_path,
+        embedding_function=embeddings
+    )
+    doc_count = vectordb._collection.count()
+    print(f"--- Database contains {doc_count} documents ---")
+    return vectordb if doc_count > 0 else None
+
+
+def vector_database(chunks,embeddings,flag,fingerprint=""):
     print('creating vector database')
-    DB_PATH = "ingestion/vector_db/muet_chroma_db"
+    db_path = current_db_path()
 
     # 2. Check if the database already exists locally
-    if flag and os.path.exists(DB_PATH):
+    if flag and os.path.exists(db_path):
         print("--- Loading existing database from disk ---")
         vectordb = Chroma(
-            persist_directory=DB_PATH, 
+            persist_directory=db_path,
             embedding_function=embeddings
         )
         # Check if the database is empty
         doc_count = vectordb._collection.count()
         print(f"--- Database contains {doc_count} documents ---")
-        
+
         if doc_count == 0:
             print("⚠️ Database is empty! Rebuilding with new documents...")
-            vectordb = Chroma.from_documents(
-                documents=chunks,
-                embedding=embeddings,
-                persist_directory=DB_PATH
-            )
-            print(f"--- Database rebuilt with {vectordb._collection.count()} documents ---")
+            vectordb = build_new_database(chunks, embeddings, fingerprint)
     else:
-        print("--- Creating NEW database (This will call Gemini API) ---")
-        # This step only runs if the folder doesn't exist
-        vectordb = Chroma.from_documents(
-            documents=chunks, # Ensure split_docs is defined above
-            embedding=embeddings,
-            persist_directory=DB_PATH
-        )
-        print(f"--- Database saved locally with {vectordb._collection.count()} documents! ---")
+        # Never write into the index being served: build beside it and swap
+        vectordb = build_new_database(chunks, embeddings, fingerprint)
 
     return vectordb
-
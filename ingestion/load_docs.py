@@ -1,10 +1,79 @@
+import os
+import re
+import calendar
+from datetime import datetime, timezone
+from langchain_core.documents import Document
 from langchain_community.document_loaders import TextLoader,PyMuPDFLoader,WebBaseLoader
+
+# Partition of the corpus each chunk belongs to, used to route queries:
+# "site" = static website pages, "news" = news/events/careers, "prospectus" = the PDF
+NEWS_FILE_NAME = "muet_circular_data.txt"
+
+
+def source_type(file_path: str) -> str:
+    name = os.path.basename(file_path)
+    if name == NEWS_FILE_NAME:
+        return "news"
+    if name.endswith(".pdf"):
+        return "prospectus"
+    return "site"
+
+
+def tag_source_type(documents, file_path: str):
+    for doc in documents:
+        doc.metadata["source_type"] = source_type(file_path)
+    return documents
+
+
+# News articles start with "URL: <link>" and usually a "19 Dec 2025" date line;
+# without one the year-month in the link (/news-events/2025-12/...) is used
+ARTICLE_DATE_PATTERN = re.compile(r"^(\d{1,2}) ([A-Z][a-z]{2}) (\d{4})$", re.MULTILINE)
+URL_MONTH_PATTERN = re.compile(r"/(\d{4})-(\d{2})/")
+MONTHS = {name: number for number, name in enumerate(calendar.month_abbr) if name}
+
+
+def publish_date(url: str, text: str):
+    """Publication date of a news article, or None if it cannot be found"""
+    header = "\n".join(text.splitlines()[:3])
+    match = ARTICLE_DATE_PATTERN.search(header)
+    if match and match.group(2) in MONTHS:
+        return datetime(int(match.group(3)), MONTHS[match.group(2)], int(match.group(1)), tzinfo=timezone.utc)
+    match = URL_MONTH_PATTERN.search(url)
+    if match:
+        return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+    return None
+
+
+def split_news_articles(documents):
+    """
+    One Document per news article, with its link as the source and the
+    publish date in metadata ("published" ISO date, "published_ts" epoch
+    seconds for range filters)
+    """
+    articles = []
+    for doc in documents:
+        for text in re.split(r"^(?=URL: )", doc.page_content, flags=re.MULTILINE):
+            if not text.strip():
+                continue
+            first_line = text.splitlines()[0]
+            url = first_line[len("URL: "):].strip() if first_line.startswith("URL: ") else doc.metadata.get("source")
+            metadata = {**doc.metadata, "source": url}
+            published = publish_date(url or "", text)
+            if published is not None:
+                metadata["published"] = published.date().isoformat()
+                metadata["published_ts"] = int(published.timestamp())
+            articles.append(Document(page_content=text, metadata=metadata))
+    return articles
+
+
 def document_loader(file_path: str):
     try:
         # i="data/website_documents/"+i
         print(f"loading document:{file_path}")
         loader = TextLoader(file_path, encoding='utf-8')
-        documents = loader.load()
+        documents = tag_source_type(loader.load(), file_path)
+        if source_type(file_path) == "news":
+            documents = split_news_articles(documents)
 
         if 'muet_data.txt'in file_path:
             documents=documents+pdf_loader()
@@ -18,10 +87,10 @@ def pdf_loader():
     try:
         print("loading PDF Document")
         loader=PyMuPDFLoader('data/website_documents/prospectus.pdf')
-        documents = loader.load()
+        documents = tag_source_type(loader.load(), 'prospectus.pdf')
         return documents
     except Exception as e:
         print(f"Error in load_docs.py (pdf_loader): {e}")
         loader=WebBaseLoader('https://github.com/Razakhan143/MUETBOT/blob/main/data/website_documents/prospectus.pdf')
-        documents = loader.load()
+        documents = tag_source_type(loader.load(), 'prospectus.pdf')
         return documents
\ No newline at end of file
@@ -1,19 +1,31 @@
 import os
+import sys
+import json
+import time
 import asyncio
+from typing import List, Optional
 from datetime import datetime
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext, redirect_stdout
 
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pytz import timezone
+from langchain_core.runnables import RunnableLambda
 
 from app_main.api import retriever_qa
+from app_main.assets import AssetStaticFiles, REVALIDATE_CACHE_CONTROL, index_html_path
+from app_main.leader import LeaderLock
+from app_main.limits import AdmissionController, Overloaded, TokenBucketLimiter, client_id, is_quota_error
+from app_main.sessions import ConversationHistory, SessionStore
 from data import data_processing, news_data_fetcher
+from ingestion import embed_store
+from rag import cache, metrics
+from rag.retriever import source_id
+from rag.singleflight import SingleFlight
 
 # Load environment variables
 load_dotenv()
@@ -25,9 +37,57 @@ OUTPUT_FILE = os.path.join("data", "website_documents", "muet_data.txt")
 NEWS_FILE = os.path.join("data", "website_documents", "muet_circular_data.txt")
 PK_TZ = timezone('Asia/Karachi')
 
+# Multi-worker mode: one worker (holder of this lock) runs the scheduler and
+# index refreshes; every worker polls the shared index for new versions
+LEADER_LOCK_FILE = os.path.join("ingestion", "vector_db", ".scheduler.lock")
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "30"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Maximum number of chain runs (retrieval + Gemini call) in flight at once
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "32"))
+# Requests allowed to wait for a slot, and for how long, before a 429
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "64"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Per-client token bucket. The client is the peer IP, or behind TRUSTED_PROXY_HOPS
+# proxies the X-Forwarded-For entry that many hops from the right (never a
+# client-sent header). Buckets are per worker: under gunicorn -w N a client
+# can make up to N x RATE_LIMIT_PER_MINUTE requests per minute.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))
+# Reverse proxies in front of the API that append to X-Forwarded-For (0 = clients
+# connect directly). Azure App Service (WEBSITE_INSTANCE_ID set) has one front end.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1" if os.getenv("WEBSITE_INSTANCE_ID") else "0"))
+# Retry-After sent when Gemini itself reports a quota / rate-limit error
+QUOTA_RETRY_AFTER_SECONDS = int(os.getenv("QUOTA_RETRY_AFTER_SECONDS", "30"))
+
+# Batch endpoint limits (queries per request, and default parallelism per batch)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# Batch queries per client per minute; a batch is charged one token per query
+BATCH_QUERIES_PER_MINUTE = float(os.getenv("BATCH_QUERIES_PER_MINUTE", "60"))
+
 # Global QA chain instance
 qa_chain = None
 scheduler = None
+admission = AdmissionController(MAX_INFLIGHT_REQUESTS, MAX_QUEUE_DEPTH, QUEUE_TIMEOUT_SECONDS)
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST)
+# Separate bucket so one full-size batch fits but batches cannot bypass the per-client limit
+batch_rate_limiter = TokenBucketLimiter(BATCH_QUERIES_PER_MINUTE / 60, MAX_BATCH_SIZE)
+answer_cache = cache.AnswerCache() if cache.ANSWER_CACHE_ENABLED else None
+single_flight = SingleFlight()
+# Conversation history per session id, in SQLite shared by all workers
+# (calls block on the database: use asyncio.to_thread from handlers)
+sessions = SessionStore()
+refresh_lock = asyncio.Lock()
+# "pending" -> "ready" | "failed" | "waiting_for_index" (non-leader worker, no index on
+# disk yet; watch_index opens it once published). /health is served while the chain is built
+init_state = "pending"
+init_task = None
+leader_lock = LeaderLock(LEADER_LOCK_FILE)
+# Version of the on-disk index the current qa_chain was opened from
+loaded_index_version = None
+watcher_task = None
 
 
 # ============================================================
@@ -40,6 +100,8 @@ async def run_data_extraction_job():
         print("✅ Data extraction job completed")
     except Exception as e:
         print(f"❌ Data extraction job failed: {e}")
+        return
+    await refresh_qa_chain()
 
 
 async def run_news_fetch_job():
@@ -49,29 +111,98 @@ async def run_news_fetch_job():
         print("✅ News fetch job completed")
     except Exception as e:
         print(f"❌ News fetch job failed: {e}")
+        return
+    await refresh_qa_chain()
 
 
-# ============================================================
-# FastAPI Lifespan (Startup/Shutdown)
-# ============================================================
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Manage startup and shutdown events"""
-    global qa_chain, scheduler
+async def refresh_qa_chain():
+    """
+    Rebuild the vector store and QA chain from the current source files in a
+    worker thread, then swap the global qa_chain pointer. Requests already
+    holding the old chain finish on the old index; new requests use the new one.
+    """
+    global qa_chain, init_state, loaded_index_version
     
-    # Startup
-    print("🚀 Starting MUET Chatbot API...")
+    if refresh_lock.locked():
+        print("⏭️ Index refresh already running, skipping")
+        return
     
-    # Initialize QA Chain
-    file_paths = [OUTPUT_FILE, NEWS_FILE]
-    qa_chain = retriever_qa(file_paths, flag=True)
+    async with refresh_lock:
+        file_paths = [OUTPUT_FILE, NEWS_FILE]
+        fingerprint = await asyncio.to_thread(embed_store.source_fingerprint, file_paths)
+        if fingerprint == embed_store.index_source_fingerprint():
+            print("⏭️ Source documents unchanged, keeping current index")
+            return
+        
+        print("🔄 Rebuilding index in the background...")
+        new_chain = await asyncio.to_thread(retriever_qa, file_paths, False)
+        if new_chain is None:
+            print("⚠️ Index refresh failed, keeping current QA chain")
+            return
+        
+        qa_chain = new_chain
+        loaded_index_version = embed_store.index_version()
+        init_state = "ready"
+        print("✅ QA Chain swapped to the new index")
+
+
+async def initialize_qa_chain():
+    """
+    Build (or open) the QA chain in a worker thread so that the server is
+    reachable, and /health answers, while the index is loaded
+    """
+    global qa_chain, init_state, loaded_index_version
     
-    if qa_chain is None:
-        print("⚠️ Warning: QA Chain initialization failed")
+    async with refresh_lock:
+        file_paths = [OUTPUT_FILE, NEWS_FILE]
+        # Only the leader may build a missing index; other workers wait for it to appear
+        chain = await asyncio.to_thread(retriever_qa, file_paths, True, leader_lock.held)
+        # Read after the build: the leader may just have published the first index
+        version = await asyncio.to_thread(embed_store.index_version)
+    
+    if chain is None:
+        init_state = "failed" if leader_lock.held else "waiting_for_index"
+        print(f"⚠️ Warning: QA Chain initialization failed ({init_state})")
     else:
+        qa_chain = chain
+        loaded_index_version = version
+        init_state = "ready"
         print("✅ QA Chain initialized successfully")
+
+
+async def watch_index():
+    """
+    Every INDEX_POLL_SECONDS: take over the scheduler if the leader worker
+    is gone, and reopen the chain when a new index version has been published
+    """
+    global qa_chain, init_state, loaded_index_version
+    
+    while True:
+        await asyncio.sleep(INDEX_POLL_SECONDS)
+        try:
+            if not leader_lock.held and leader_lock.try_acquire():
+                print("👑 This worker took over the scheduler")
+                start_scheduler()
+            
+            version = await asyncio.to_thread(embed_store.index_version)
+            if version == loaded_index_version or refresh_lock.locked():
+                continue
+            
+            async with refresh_lock:
+                chain = await asyncio.to_thread(retriever_qa, [OUTPUT_FILE, NEWS_FILE], True, False)
+            if chain is not None:
+                qa_chain = chain
+                loaded_index_version = version
+                init_state = "ready"
+                print("🔄 QA Chain reopened on the new index version")
+        except Exception as e:
+            print(f"⚠️ Index watcher error: {e}")
+
+
+def start_scheduler():
+    """Start the crawl/refresh scheduler (leader worker only)"""
+    global scheduler
     
-    # Initialize and start scheduler
     scheduler = AsyncIOScheduler(timezone=PK_TZ)
     
     # Schedule data extraction (one-time run on specific date)
@@ -94,14 +225,39 @@ async def lifespan(app: FastAPI):
     
     scheduler.start()
     print("📅 Scheduler started")
+
+
+# ============================================================
+# FastAPI Lifespan (Startup/Shutdown)
+# ============================================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage startup and shutdown events"""
+    global init_task, watcher_task
+    
+    # Startup
+    print("🚀 Starting MUET Chatbot API...")
+    
+    # Leader election: exactly one worker owns the scheduler and refresh pipeline
+    if leader_lock.try_acquire():
+        print(f"👑 Worker {os.getpid()} is the scheduler leader")
+        start_scheduler()
+    else:
+        print(f"👥 Worker {os.getpid()} serves the shared index (scheduler runs elsewhere)")
+    
+    # Initialize QA Chain in the background; requests get 503 until it is ready
+    init_task = asyncio.create_task(initialize_qa_chain())
+    watcher_task = asyncio.create_task(watch_index())
     
     yield  # Application runs here
     
     # Shutdown
     print("🛑 Shutting down...")
+    watcher_task.cancel()
     if scheduler:
         scheduler.shutdown(wait=False)
         print("📅 Scheduler stopped")
+    leader_lock.release()
 
 
 # ============================================================
@@ -123,20 +279,165 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
+# Mount static files (optimized copies under static/dist: python -m app_main.assets)
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(STATIC_DIR):
-    app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+    app.mount("/static", AssetStaticFiles(directory=STATIC_DIR), name="static")
+
+
+def endpoint_label(request: Request) -> str:
+    """
+    Route template the request matched ("/chat/session/{session_id}"), so
+    metric labels stay bounded; unmatched paths are grouped as "other"
+    """
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "other"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count /chat* requests and failures, and time the non-streaming ones"""
+    if not request.url.path.startswith("/chat"):
+        return await call_next(request)
+    
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        endpoint = endpoint_label(request)
+        metrics.REQUESTS.inc(endpoint=endpoint)
+        metrics.REQUEST_ERRORS.inc(endpoint=endpoint, status="500")
+        raise
+    # The route is only known once the router has matched the request
+    endpoint = endpoint_label(request)
+    metrics.REQUESTS.inc(endpoint=endpoint)
+    if response.status_code >= 400:
+        metrics.REQUEST_ERRORS.inc(endpoint=endpoint, status=str(response.status_code))
+    if endpoint != "/chat/stream":
+        # Streams are timed to their last token inside the stream itself
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+    return response
 
 
 # Request/Response Models
 class ChatRequest(BaseModel):
     query: str
+    session_id: Optional[str] = Field(default=None, max_length=128)
 
 
 class ChatResponse(BaseModel):
     answer: str
     status: str = "success"
+    session_id: Optional[str] = None
+
+
+class BatchChatRequest(BaseModel):
+    queries: List[str]
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    query: str
+    answer: Optional[str] = None
+    status: str = "success"
+    error: Optional[str] = None
+    elapsed_ms: float
+
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchItemResult]
+    total_elapsed_ms: float
+    succeeded: int
+    failed: int
+
+
+def extract_answer(response) -> str:
+    """Handle the different response formats a chain may return"""
+    if isinstance(response, dict):
+        return response.get("result", response.get("answer", str(response)))
+    return str(response)
+
+
+def too_many_requests(detail: str, retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+def rate_limit(raw_request: Request, limiter=None, cost=1.0):
+    """Apply the per-client token bucket, raising 429 when it is empty"""
+    try:
+        (limiter or rate_limiter).acquire(client_id(raw_request, TRUSTED_PROXY_HOPS), cost)
+    except Overloaded as e:
+        raise too_many_requests(e.detail, e.retry_after)
+
+
+def session_id_of(request: ChatRequest, raw_request: Request) -> str:
+    """Session from the body, else the X-Session-ID header, else a new one"""
+    return request.session_id or raw_request.headers.get("x-session-id") or sessions.new_session_id()
+
+
+def answer_cache_key(query: str) -> str:
+    """Exact-match cache key: normalized query + corpus version + date bucket"""
+    # The version of the index the serving chain was opened from (held in memory, no disk read)
+    corpus = cache.corpus_version([OUTPUT_FILE, NEWS_FILE], lambda: loaded_index_version or "")
+    return cache.answer_cache_key(query, corpus)
+
+
+async def _cached_answer(answer: str):
+    yield answer
+
+
+def stream_query(chain, query: str, stream: bool = True, history: str = ""):
+    """
+    Yield the answer to a query in chunks: from the exact-match cache if
+    possible, otherwise from a chain run shared with identical in-flight
+    queries (single-flight) whose answer is then cached.
+    Follow-ups with conversation history depend on that history, so they
+    always run the chain and are neither cached nor coalesced.
+    Raises Overloaded if a new chain run cannot be admitted.
+    """
+    key = None if history else answer_cache_key(query)
+    if key is not None and answer_cache is not None:
+        answer = answer_cache.get(key)
+        if answer is not None:
+            return _cached_answer(answer)
+    
+    if key is None:
+        # Runs only when the caller iterates, so check now and claim the place then
+        admission.check()
+    elif key not in single_flight:
+        # Claim the queue place before any response is started, so a full queue is a 429
+        admission.reserve()
+    
+    chain_input = {"question": query, "history": history} if history else query
+    
+    async def produce():
+        chunks = []
+        async with admission.slot(reserved=key is not None):
+            if stream:
+                async for chunk in chain.astream(chain_input):
+                    if chunk:
+                        chunks.append(chunk)
+                        yield chunk
+            else:
+                response = await chain.ainvoke(chain_input)
+                chunks.append(extract_answer(response))
+                yield chunks[-1]
+        if key is not None and answer_cache is not None:
+            answer_cache.set(key, "".join(chunks))
+    
+    if key is None:
+        return produce()
+    return single_flight.stream(key, produce)
+
+
+async def run_query(chain, query: str, history: str = "") -> str:
+    """Answer a query (cached / coalesced), returning the full answer"""
+    return "".join([chunk async for chunk in stream_query(chain, query, stream=False, history=history)])
 
 
 # ============================================================
@@ -145,9 +446,10 @@ class ChatResponse(BaseModel):
 @app.get("/")
 def read_root():
     """Serve the frontend HTML page"""
-    html_path = os.path.join(STATIC_DIR, "index.html")
+    html_path = index_html_path()
     if os.path.exists(html_path):
-        return FileResponse(html_path)
+        # Revalidated each visit so new asset hashes are picked up right away
+        return FileResponse(html_path, headers={"Cache-Control": REVALIDATE_CACHE_CONTROL})
     return {"message": "MUET Chatbot API is running", "status": "healthy"}
 
 
@@ -158,7 +460,7 @@ def api_info():
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, raw_request: Request):
     """
     Main chat endpoint for the MUET chatbot
     """
@@ -174,27 +476,203 @@ async def chat(request: ChatRequest):
     if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
+    rate_limit(raw_request)
+    session_id = session_id_of(request, raw_request)
+    
     try:
-        response = qa_chain.invoke(query)
-        
-        # Handle different response formats
-        if isinstance(response, dict):
-            answer = response.get("result", response.get("answer", str(response)))
-        else:
-            answer = str(response)
-        
-        return ChatResponse(answer=answer)
+        history = await asyncio.to_thread(sessions.history, session_id)
+        answer = await run_query(qa_chain, query, history)
+        await asyncio.to_thread(sessions.add_turn, session_id, query, answer)
+        return ChatResponse(answer=answer, session_id=session_id)
     
+    except Overloaded as e:
+        raise too_many_requests(e.detail, e.retry_after)
     except Exception as e:
+        if is_quota_error(e):
+            raise too_many_requests("The AI service is busy, please retry shortly.", QUOTA_RETRY_AFTER_SECONDS)
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
+def sse_event(data: dict, event: str = None) -> str:
+    """Format a Server-Sent Events message"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, raw_request: Request):
+    """
+    Streaming chat endpoint: sends answer tokens as Server-Sent Events
+    while Gemini generates them, then a final "done" event
+    """
+    global qa_chain
+    
+    if qa_chain is None:
+        raise HTTPException(
+            status_code=503,
+            detail="QA Chain not initialized. Please try again later."
+        )
+    
+    query = request.query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    rate_limit(raw_request)
+    session_id = session_id_of(request, raw_request)
+    
+    history = await asyncio.to_thread(sessions.history, session_id)
+    try:
+        chunks = stream_query(qa_chain, query, history=history)
+    except Overloaded as e:
+        raise too_many_requests(e.detail, e.retry_after)
+    
+    start = time.perf_counter()
+    
+    async def event_stream():
+        first_token = True
+        answer = []
+        try:
+            async for chunk in chunks:
+                if first_token:
+                    metrics.TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start)
+                    first_token = False
+                answer.append(chunk)
+                yield sse_event({"token": chunk})
+            await asyncio.to_thread(sessions.add_turn, session_id, query, "".join(answer))
+            yield sse_event({"status": "success", "session_id": session_id}, event="done")
+        except Overloaded as e:
+            metrics.REQUEST_ERRORS.inc(endpoint="/chat/stream", status="429")
+            yield sse_event({"detail": e.detail, "retry_after": e.retry_after}, event="error")
+        except Exception as e:
+            metrics.REQUEST_ERRORS.inc(endpoint="/chat/stream", status="stream_error")
+            if is_quota_error(e):
+                yield sse_event({
+                    "detail": "The AI service is busy, please retry shortly.",
+                    "retry_after": QUOTA_RETRY_AFTER_SECONDS
+                }, event="error")
+            else:
+                yield sse_event({"detail": f"Error processing query: {str(e)}"}, event="error")
+        finally:
+            metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint="/chat/stream")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-ID": session_id}
+    )
+
+
+@app.delete("/chat/session/{session_id}")
+def clear_session(session_id: str):
+    """Forget a conversation (e.g. when the user clears the chat)"""
+    sessions.clear(session_id)
+    return {"status": "success"}
+
+
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest, raw_request: Request):
+    """
+    Run a list of queries through the chain with bounded parallelism.
+    Results come back in request order, each with its own status and timing;
+    one failing query does not fail the batch.
+    """
+    global qa_chain
+    
+    if qa_chain is None:
+        raise HTTPException(
+            status_code=503,
+            detail="QA Chain not initialized. Please try again later."
+        )
+    
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Queries cannot be empty")
+    if len(request.queries) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.queries)} queries (max {MAX_BATCH_SIZE})"
+        )
+    
+    rate_limit(raw_request, batch_rate_limiter, cost=len(request.queries))
+    
+    chain = qa_chain
+    max_concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, MAX_INFLIGHT_REQUESTS)
+    
+    async def run_item(item):
+        index, query = item
+        query = query.strip()
+        start = time.perf_counter()
+        try:
+            if not query:
+                raise ValueError("Query cannot be empty")
+            answer = await run_query(chain, query)
+            return BatchItemResult(
+                index=index,
+                query=query,
+                answer=answer,
+                elapsed_ms=(time.perf_counter() - start) * 1000
+            )
+        except Exception as e:
+            return BatchItemResult(
+                index=index,
+                query=query,
+                status="error",
+                error=str(e),
+                elapsed_ms=(time.perf_counter() - start) * 1000
+            )
+    
+    start = time.perf_counter()
+    results = await RunnableLambda(run_item).abatch(
+        list(enumerate(request.queries)),
+        config={"max_concurrency": max_concurrency}
+    )
+    failed = sum(1 for result in results if result.status != "success")
+    
+    return BatchChatResponse(
+        results=results,
+        total_elapsed_ms=(time.perf_counter() - start) * 1000,
+        succeeded=len(results) - failed,
+        failed=failed
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus-style metrics: request counts/errors, per-stage latencies, sizes, cache hit ratios"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/live")
+def liveness():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def readiness():
+    """Readiness: the QA chain is loaded and queries can be answered"""
+    if qa_chain is None:
+        raise HTTPException(status_code=503, detail=f"QA Chain not ready ({init_state})")
+    return {"status": "ready"}
+
+
 @app.get("/health")
 def health_check():
     """Detailed health check"""
     return {
         "status": "healthy",
+        "live": True,
+        "ready": qa_chain is not None,
+        "initialization": init_state,
+        "worker_pid": os.getpid(),
+        "scheduler_leader": leader_lock.held,
+        "index_version": loaded_index_version,
         "qa_chain_ready": qa_chain is not None,
+        "admission": admission.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "batch_rate_limiter": batch_rate_limiter.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "single_flight": single_flight.stats(),
+        "sessions": sessions.stats(),
         "scheduler_running": scheduler is not None and scheduler.running if scheduler else False
     }
 
@@ -217,6 +695,7 @@ async def run_cli_chatbot():
         return
     
     print("\n🎓 MUET Chatbot Ready! (Type 'exit' to quit)")
+    history = ConversationHistory()
     
     while True:
         try:
@@ -233,25 +712,144 @@ async def run_cli_chatbot():
             continue
         
         try:
-            response = qa_chain.invoke(query)
+            response = qa_chain.invoke({"question": query, "history": history.render()})
             
             if isinstance(response, dict):
                 answer = response.get("result", response.get("answer", str(response)))
             else:
                 answer = response
+            history.add_turn(query, answer)
             
             print(f"\nAI Response: {answer}")
         except Exception as e:
             print(f"❌ Error during query: {str(e)}")
 
 
+# ============================================================
+# Batch Mode (offline evaluation, replaying query logs)
+# ============================================================
+def read_batch_queries(lines, input_format="auto"):
+    """
+    Yield (id, query, error) from plain-text lines (one question per line) or
+    JSONL records with "query" (or "question") and an optional "id"
+    """
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if input_format == "jsonl" or (input_format == "auto" and line.startswith("{")):
+            try:
+                record = json.loads(line)
+                yield record.get("id", line_number), (record.get("query") or record.get("question") or "").strip(), None
+            except (ValueError, AttributeError) as e:
+                yield line_number, None, f"Invalid JSON line: {e}"
+        else:
+            yield line_number, line, None
+
+
+async def answer_traced(chain, query_id, query: str) -> dict:
+    """Answer one query, recording retrieved sources and per-stage timings"""
+    trace = metrics.TraceCallbackHandler()
+    start = time.perf_counter()
+    result = {"id": query_id, "query": query, "answer": None, "status": "success"}
+    try:
+        response = await chain.ainvoke(query, config={"callbacks": [trace]})
+        result["answer"] = extract_answer(response)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    
+    documents = trace.selected if trace.selected is not None else trace.documents
+    result["sources"] = list(dict.fromkeys(source_id(doc) for doc in documents))
+    result["context_tokens"] = trace.context_tokens
+    result["timings_ms"] = {stage: round(seconds * 1000, 1) for stage, seconds in trace.timings.items()}
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+async def run_batch_cli(input_path="-", output_path=None, concurrency=BATCH_MAX_CONCURRENCY,
+                        input_format="auto", use_cache=True):
+    """Answer every question in a file (or stdin) and write JSONL results"""
+    global qa_chain
+    
+    # Progress and library output go to stderr so stdout carries only JSONL
+    with redirect_stdout(sys.stderr):
+        print("🔄 Initializing MUET Chatbot...")
+        qa_chain = retriever_qa([OUTPUT_FILE, NEWS_FILE], flag=True)
+        if qa_chain is None:
+            print("❌ Failed to initialize QA Chain. Exiting.")
+            return 1
+        chain = qa_chain
+        if not use_cache and isinstance(chain, cache.SemanticCacheRunnable):
+            chain = chain.chain
+        
+        elapsed = []
+        failed = 0
+        start = time.perf_counter()
+        
+        # Files are opened only once the chain is ready, so a failed init leaves no truncated output
+        try:
+            with (nullcontext(sys.stdin) if input_path == "-" else open(input_path, "r", encoding="utf-8")) as input_file, \
+                    (open(output_path, "w", encoding="utf-8") if output_path else nullcontext(sys.stdout)) as results_file:
+                queries = read_batch_queries(input_file, input_format)
+                
+                async def worker():
+                    nonlocal failed
+                    # Workers pull from one shared iterator, so the input is never held in memory
+                    for query_id, query, error in queries:
+                        if error or not query:
+                            result = {"id": query_id, "query": query, "answer": None, "status": "error",
+                                      "error": error or "Query cannot be empty"}
+                        else:
+                            result = await answer_traced(chain, query_id, query)
+                        if result["status"] == "success":
+                            elapsed.append(result["elapsed_ms"])
+                        failed += result["status"] != "success"
+                        results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+                        results_file.flush()
+                
+                await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+        except OSError as e:
+            print(f"❌ Batch file error: {e}")
+            return 1
+        
+        elapsed.sort()
+        summary = f"✅ Answered {len(elapsed)} queries ({failed} failed) in {time.perf_counter() - start:.1f}s"
+        if elapsed:
+            p50 = elapsed[len(elapsed) // 2]
+            p95 = elapsed[min(int(len(elapsed) * 0.95), len(elapsed) - 1)]
+            summary += f", p50 {p50:.0f} ms, p95 {p95:.0f} ms"
+        print(summary)
+    return 0 if not failed else 2
+
+
 # ============================================================
 # Main Entry Point
 # ============================================================
 if __name__ == "__main__":
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="MUET Chatbot API server, terminal chatbot and batch runner")
+    parser.add_argument("--cli", action="store_true", help="interactive terminal chatbot")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="answer questions from FILE (default stdin), plain lines or JSONL")
+    parser.add_argument("-o", "--output", help="batch: JSONL results file (default stdout)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY,
+                        help="batch: questions answered in parallel")
+    parser.add_argument("--input-format", choices=["auto", "text", "jsonl"], default="auto",
+                        help="batch: input format (auto detects JSONL lines)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="batch: bypass the semantic cache, e.g. for benchmarking")
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--cli":
+    if args.batch:
+        try:
+            sys.exit(asyncio.run(run_batch_cli(
+                args.batch, args.output, args.concurrency, args.input_format, not args.no_cache
+            )))
+        except KeyboardInterrupt:
+            print("\n\nProcess stopped by user.", file=sys.stderr)
+    elif args.cli:
         # Run in CLI mode
         try:
             asyncio.run(run_cli_chatbot())
@@ -262,4 +860,9 @@ if __name__ == "__main__":
         import uvicorn
         print("Starting MUET Chatbot API server...")
         print("Use --cli flag to run in terminal mode: python main.py --cli")
-        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+        print("Use --batch to answer questions from a file: python main.py --batch questions.txt")
+        if WORKERS > 1:
+            # Workers import the app by name; one of them is elected scheduler leader
+            uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,10 +1,13 @@
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 import os
 load_dotenv()
+
+# Provider SDKs are imported inside the factories: they take most of a second
+# to import and the API server should be reachable before the chain is built.
 def chat_model():
     print("selecting chat model")
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    # from langchain_openai import ChatOpenAI
     
     llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash",temperature=0.7)
     
@@ -20,4 +23,5 @@ def chat_model():
 
 def embeddings_model():
     print("selecting embeding model")
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
     return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
\ No newline at end of file
@@ -0,0 +1,492 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableConfig
+from pytz import timezone
+
+from rag import intent
+from rag.metrics import record_cache_lookup
+
+# ============================================================
+# Configuration
+# ============================================================
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+# Cosine similarity above which an earlier query counts as the same question
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+# Persistent query-embedding cache: popular questions skip the embedding API call
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("ingestion", "vector_db", "query_embeddings.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+# LRU recency of cache hits is written in batches, not once per hit
+EMBEDDING_CACHE_TOUCH_BATCH = int(os.getenv("EMBEDDING_CACHE_TOUCH_BATCH", "64"))
+EMBEDDING_CACHE_TOUCH_SECONDS = float(os.getenv("EMBEDDING_CACHE_TOUCH_SECONDS", "60"))
+
+# Width of the date bucket in cache keys, in minutes. Capped at one day so
+# that "Today/Tomorrow/Expired" answers are never served across midnight.
+CACHE_DATE_BUCKET_MINUTES = min(int(os.getenv("CACHE_DATE_BUCKET_MINUTES", "1440")), 1440)
+
+PK_TZ = timezone('Asia/Karachi')
+
+
+# ============================================================
+# Cache Keys
+# ============================================================
+def normalize_query(query: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace"""
+    query = re.sub(r"[^\w\s]", " ", query.casefold())
+    return " ".join(query.split())
+
+
+def date_bucket(now=None, minutes=CACHE_DATE_BUCKET_MINUTES) -> str:
+    """Current date bucket in Pakistan time, e.g. "2025-12-19/0" """
+    now = now or datetime.now(PK_TZ)
+    minute_of_day = now.hour * 60 + now.minute
+    return f"{now.strftime('%Y-%m-%d')}/{minute_of_day // minutes}"
+
+
+def seconds_until_bucket_end(now=None, minutes=CACHE_DATE_BUCKET_MINUTES) -> float:
+    """Seconds left in the current date bucket"""
+    now = now or datetime.now(PK_TZ)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    minute_of_day = now.hour * 60 + now.minute
+    bucket_end = midnight + timedelta(minutes=(minute_of_day // minutes + 1) * minutes)
+    return max((bucket_end - now).total_seconds(), 0.0)
+
+
+def corpus_version(file_paths, version_fn=None) -> str:
+    """
+    Version of the answerable corpus: the size and mtime of every source
+    file plus the vector store version. A news refresh changes it.
+    """
+    parts = []
+    for path in file_paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parts.append("-")
+    if version_fn:
+        parts.append(version_fn())
+    return "|".join(parts)
+
+
+def answer_cache_key(query: str, corpus: str = "") -> str:
+    return f"{date_bucket()}|{corpus}|{normalize_query(query)}"
+
+
+# ============================================================
+# Exact-Match Answer Cache
+# ============================================================
+class AnswerCache:
+    """
+    LRU + TTL cache of final answers keyed by answer_cache_key(). Entries
+    never outlive the date bucket they were created in.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                record_cache_lookup("answer", hit=False)
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_cache_lookup("answer", hit=True)
+            return entry[0]
+
+    def set(self, key: str, answer: str):
+        ttl = min(self.ttl_seconds, seconds_until_bucket_end())
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+# ============================================================
+# Semantic Cache
+# ============================================================
+class SemanticCache:
+    """
+    Answer cache keyed on query embeddings. A lookup returns the answer of
+    the most similar earlier query if its cosine similarity is above the
+    threshold. Entries expire after a TTL or at the end of their date
+    bucket. A cache belongs to one chain build: when a refresh or the index
+    watcher swaps in a chain on a new index, it comes with an empty cache.
+    """
+
+    def __init__(self, embeddings, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds=SEMANTIC_CACHE_TTL, max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._answers = []
+        self._expires_at = []
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._answers)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._answers = []
+        self._expires_at = []
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict_expired(self, now):
+        keep = [i for i, expires_at in enumerate(self._expires_at) if expires_at > now]
+        if len(keep) != len(self._answers):
+            self._vectors = self._vectors[keep]
+            self._answers = [self._answers[i] for i in keep]
+            self._expires_at = [self._expires_at[i] for i in keep]
+
+    def match(self, vector) -> Optional[str]:
+        """Return the cached answer for an already-embedded query, if any"""
+        vector = self._normalize(vector)
+        with self._lock:
+            self._evict_expired(time.monotonic())
+
+            if not self._answers or self._vectors.shape[1] != vector.shape[0]:
+                self.misses += 1
+                record_cache_lookup("semantic", hit=False)
+                return None
+
+            scores = self._vectors @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                self.hits += 1
+                record_cache_lookup("semantic", hit=True)
+                return self._answers[best]
+
+            self.misses += 1
+            record_cache_lookup("semantic", hit=False)
+            return None
+
+    def add(self, vector, answer: str):
+        """Store the answer for an already-embedded query"""
+        vector = self._normalize(vector)
+        with self._lock:
+            if self._answers and self._vectors.shape[1] != vector.shape[0]:
+                self._reset()
+
+            if len(self._answers) >= self.max_entries:
+                # Expiry times only grow with insertion, so the oldest expires first
+                self._vectors = self._vectors[1:]
+                self._answers = self._answers[1:]
+                self._expires_at = self._expires_at[1:]
+
+            if self._answers:
+                self._vectors = np.vstack([self._vectors, vector])
+            else:
+                self._vectors = vector.reshape(1, -1)
+            self._answers.append(answer)
+            ttl = min(self.ttl_seconds, seconds_until_bucket_end())
+            self._expires_at.append(time.monotonic() + ttl)
+
+    def embed(self, query: str):
+        try:
+            return self.embeddings.embed_query(query)
+        except Exception as e:
+            print(f"⚠️ Semantic cache embedding failed: {e}")
+            return None
+
+    async def aembed(self, query: str):
+        try:
+            return await self.embeddings.aembed_query(query)
+        except Exception as e:
+            print(f"⚠️ Semantic cache embedding failed: {e}")
+            return None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+def cacheable_query(input: Any) -> Optional[str]:
+    """
+    Query text to cache on, or None if the answer also depends on earlier
+    conversation turns (a {"question", "history"} input with history) or the
+    message is small talk (answered without retrieval, not worth an embedding call)
+    """
+    if isinstance(input, dict):
+        input = None if input.get("history") else input.get("question")
+    if not isinstance(input, str) or intent.is_small_talk(input):
+        return None
+    return input
+
+
+class SemanticCacheRunnable(Runnable):
+    """
+    Wraps a query -> answer chain with a SemanticCache. Hits return the
+    cached answer without retrieval or generation; misses run the chain
+    and cache its answer. Streaming is preserved on misses. Follow-up turns
+    that carry conversation history, and small talk, bypass the cache.
+    """
+
+    def __init__(self, chain: Runnable, cache: SemanticCache):
+        self.chain = chain
+        self.cache = cache
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        query = cacheable_query(input)
+        vector = self.cache.embed(query) if query is not None else None
+        if vector is not None:
+            answer = self.cache.match(vector)
+            if answer is not None:
+                return answer
+
+        answer = self.chain.invoke(input, config, **kwargs)
+        if vector is not None:
+            self.cache.add(vector, answer)
+        return answer
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        query = cacheable_query(input)
+        vector = await self.cache.aembed(query) if query is not None else None
+        if vector is not None:
+            answer = self.cache.match(vector)
+            if answer is not None:
+                return answer
+
+        answer = await self.chain.ainvoke(input, config, **kwargs)
+        if vector is not None:
+            self.cache.add(vector, answer)
+        return answer
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[str]:
+        query = cacheable_query(input)
+        vector = self.cache.embed(query) if query is not None else None
+        if vector is not None:
+            answer = self.cache.match(vector)
+            if answer is not None:
+                yield answer
+                return
+
+        chunks = []
+        for chunk in self.chain.stream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if vector is not None:
+            self.cache.add(vector, "".join(chunks))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[str]:
+        query = cacheable_query(input)
+        vector = await self.cache.aembed(query) if query is not None else None
+        if vector is not None:
+            answer = self.cache.match(vector)
+            if answer is not None:
+                yield answer
+                return
+
+        chunks = []
+        async for chunk in self.chain.astream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if vector is not None:
+            self.cache.add(vector, "".join(chunks))
+
+
+# ============================================================
+# Query Embedding Cache
+# ============================================================
+def normalize_embedding_text(text: str) -> str:
+    """Case-fold and collapse whitespace; punctuation is kept because it can change the meaning"""
+    return " ".join(text.casefold().split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with an on-disk LRU cache of query embeddings,
+    keyed on (model name, normalized query). The cache is a SQLite file, so
+    it survives restarts and is shared by all worker processes. Document
+    embeddings (index builds) are passed through uncached. The async path
+    does its SQLite work in a thread, so a busy database never stalls the
+    event loop.
+    """
+
+    def __init__(self, embeddings: Embeddings, path=EMBEDDING_CACHE_PATH,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        # WAL keeps readers in other workers unblocked and makes each write a cheap append
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_lru ON query_embeddings (last_used)")
+        self._db.commit()
+        # Approximate (other workers insert too); only used to decide when to evict
+        self._count = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        # Hits not yet written back: key -> last used time
+        self._touched = {}
+        self._touched_flushed_at = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, text: str) -> Optional[List[float]]:
+        key = normalize_embedding_text(text)
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE model = ? AND text = ?",
+                    (self.model_name, key),
+                ).fetchone()
+                if row is not None:
+                    self._touched[key] = time.time()
+                    if (len(self._touched) >= EMBEDDING_CACHE_TOUCH_BATCH
+                            or time.monotonic() - self._touched_flushed_at >= EMBEDDING_CACHE_TOUCH_SECONDS):
+                        self._flush_touched()
+                        self._db.commit()
+        except sqlite3.Error as e:
+            self._db.rollback()
+            print(f"⚠️ Embedding cache read failed: {e}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            record_cache_lookup("embedding", hit=False)
+            return None
+        self.hits += 1
+        record_cache_lookup("embedding", hit=True)
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def _flush_touched(self):
+        """Write pending hit times (caller holds the lock and commits)"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE query_embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                [(used, self.model_name, key) for key, used in self._touched.items()],
+            )
+            self._touched = {}
+        self._touched_flushed_at = time.monotonic()
+
+    def _put(self, text: str, vector: List[float]):
+        key = normalize_embedding_text(text)
+        try:
+            with self._lock:
+                self._flush_touched()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, text, vector, last_used) VALUES (?, ?, ?, ?)",
+                    (self.model_name, key, np.asarray(vector, dtype=np.float32).tobytes(), time.time()),
+                )
+                self._count += 1
+                if self._count > self.max_entries:
+                    # Evict least recently used entries beyond the size limit
+                    self._db.execute(
+                        "DELETE FROM query_embeddings WHERE rowid IN ("
+                        "SELECT rowid FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+                    self._count = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+                self._db.commit()
+        except sqlite3.Error as e:
+            self._db.rollback()
+            print(f"⚠️ Embedding cache write failed: {e}")
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._put(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = await asyncio.to_thread(self._get, text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self._put, text, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
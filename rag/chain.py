@@ -1,28 +1,99 @@
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnableBranch, RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
+from operator import itemgetter
 from datetime import datetime
 from pytz import timezone
 
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
+from rag import intent, recency, rerank, router
+from rag.context import pack_context
+from rag.dedupe import dedupe_chunks
+from rag.metrics import INTENTS, MetricsCallbackHandler
+from rag.prompt import rewrite_templete, small_talk_templete
 
 def get_current_datetime():
     """Get current datetime in Pakistan timezone"""
     pk_tz = timezone('Asia/Karachi')
     return datetime.now(pk_tz).strftime("%Y-%m-%d %H:%M:%S %Z")
 
-def rag_chain(retriever, prompt_template, llm):
+def chat_input(query):
+    """Accept a plain question or {"question", "history"} from a session"""
+    if isinstance(query, dict):
+        return {"question": query["question"], "history": query.get("history") or ""}
+    return {"question": query, "history": ""}
+
+def clean_rewrite(text):
+    return text.strip().strip('"').strip() or None
+
+def query_rewrite_chain(llm):
+    """Standalone search query for follow-ups; other questions are searched as asked"""
+    rewrite = rewrite_templete() | llm | StrOutputParser() | RunnableLambda(clean_rewrite)
+    return RunnableBranch(
+        (intent.needs_rewrite, rewrite),
+        itemgetter("question"),
+    ).with_config(run_name="query_rewrite")
+
+def small_talk_chain(llm):
+    """Greetings / chit-chat: a canned reply, or a short prompt with no retrieval"""
+    short_chain = small_talk_templete() | llm | StrOutputParser()
+
+    def respond(query):
+        query = intent.question_of(query)
+        INTENTS.inc(intent=intent.classify_small_talk(query))
+        canned = intent.canned_response(query)
+        if canned is not None:
+            return canned
+        return short_chain
+
+    return RunnableLambda(respond).with_config(run_name="small_talk")
+
+
+def rerank_stage(reranker, top_n=rerank.RERANK_TOP_N):
+    """
+    Rescore the over-fetched candidates (if a reranker is configured) and
+    keep the best top_n. News-type queries also get a time-decay boost so
+    current articles win over stale ones.
+    """
+    def rerank_docs(x):
+        query = x["search_query"] or x["question"]
+        docs = x["docs"]
+        if reranker is not None:
+            docs = reranker.rerank(query, docs, len(docs))
+        if router.route_name(router.route_query(query)) == "news":
+            docs = recency.boost_recent(docs)
+        # Same cut with or without a reranker, so the prompt size does not depend on it
+        return docs[:top_n]
+
+    return RunnableLambda(rerank_docs).with_config(run_name="rerank")
+
+def rag_chain(retriever, prompt_template, llm, reranker=None):
     print("creating RAG chain")
-    rag_chain = (
-        {
-            "content": retriever | format_docs,
-            "question": RunnablePassthrough(),
+    # Configured by RERANKER; get_reranker() returns None when the stage is off
+    reranker = reranker or rerank.get_reranker()
+    # Stages are named so MetricsCallbackHandler can time each one
+    information_chain = (
+        RunnableLambda(chat_input)
+        | RunnablePassthrough.assign(search_query=query_rewrite_chain(llm))
+        | {
+            "content": RunnablePassthrough.assign(
+                docs=RunnableLambda(lambda x: x["search_query"] or x["question"]) | retriever
+            )
+            | rerank_stage(reranker)
+            | RunnableLambda(dedupe_chunks).with_config(run_name="dedupe")
+            | RunnableLambda(pack_context).with_config(run_name="pack_context"),
+            "question": itemgetter("question"),
+            "history": lambda x: x["history"] or "(none, this is the first message)",
             "date_time": RunnableLambda(lambda x: get_current_datetime())
         }
-        | prompt_template
+        | prompt_template.with_config(run_name="prompt")
         | llm
-        | StrOutputParser()
+        | StrOutputParser().with_config(run_name="parser")
     )
 
+    # Cheap lexical intent gate: small talk skips the k=10 retrieval and the large prompt
+    rag_chain = RunnableBranch(
+        (intent.is_small_talk, small_talk_chain(llm)),
+        information_chain,
+    ).with_config(run_name="rag_chain", callbacks=[MetricsCallbackHandler()])
+
     print("Professional MUET Chatbot Chain is ready!")
     return rag_chain
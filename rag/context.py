@@ -0,0 +1,123 @@
+import os
+from typing import List
+
+from langchain_core.documents import Document
+
+from rag.metrics import CONTEXT_TOKENS, estimate_tokens
+
+# Upper bound on context tokens sent to the LLM per question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# A partial chunk is only worth adding if at least this much budget is left
+MIN_PARTIAL_TOKENS = 100
+BLOCK_SEPARATOR = "\n\n"
+
+
+class _Block:
+    """Contiguous text from one source page, built from one or more chunks"""
+
+    def __init__(self, doc: Document):
+        metadata = doc.metadata or {}
+        self.key = (metadata.get("source"), metadata.get("page"))
+        self.start = metadata.get("start_index")
+        self.end = metadata.get("end_index", (self.start or 0) + len(doc.page_content))
+        self.text = doc.page_content
+        self.header = _header(doc)
+
+    def accepts(self, doc: Document) -> bool:
+        """True if doc is adjacent to (or overlaps) this block in the same source page"""
+        metadata = doc.metadata or {}
+        start = metadata.get("start_index")
+        if self.start is None or start is None or (metadata.get("source"), metadata.get("page")) != self.key:
+            return False
+        end = metadata.get("end_index", start + len(doc.page_content))
+        return self.start <= start <= self.end or start <= self.start <= end
+
+    def merge(self, doc: Document) -> bool:
+        """Join doc onto this block if it is adjacent in the same source page"""
+        if not self.accepts(doc):
+            return False
+        metadata = doc.metadata
+        start = metadata["start_index"]
+        end = metadata.get("end_index", start + len(doc.page_content))
+        if self.start <= start <= self.end:
+            # Follows this block (possibly overlapping it)
+            self.text += doc.page_content[self.end - start:] if end > self.end else ""
+            self.end = max(self.end, end)
+            return True
+        if start <= self.start <= end:
+            # Precedes this block
+            self.text = doc.page_content[:self.start - start] + self.text
+            self.start = start
+            self.end = max(self.end, end)
+            return True
+
+    def render(self) -> str:
+        return self.header + self.text
+
+
+def _header(doc: Document) -> str:
+    """
+    Line put before a block. Later chunks of an article lose its date line;
+    the LLM needs it for "upcoming"/"latest"
+    """
+    published = (doc.metadata or {}).get("published")
+    return f"(Published {published})\n" if published else ""
+
+
+def _truncate(text: str, tokens: int) -> str:
+    """Cut text to about tokens, at a line or word boundary"""
+    limit = tokens * 4
+    cut = text[:limit]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return cut[:boundary] if boundary > limit // 2 else cut
+
+
+def pack_context(documents: List[Document], token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Pack retrieved chunks into the prompt context within a token budget:
+    best-scored chunks first, adjacent chunks of the same source page merged
+    back into contiguous text, stopping once the budget is full.
+    """
+    ranked = sorted(
+        enumerate(documents),
+        key=lambda item: (-(item[1].metadata or {}).get("score", 0.0), item[0]),
+    )
+
+    # Counted in characters, the unit estimate_tokens works in (~4 per token), so
+    # headers and block separators are charged exactly and the total never overshoots
+    char_budget = token_budget * 4
+    blocks = []
+    used = 0
+    for _, doc in ranked:
+        block = next((block for block in blocks if block.accepts(doc)), None)
+        # A new block also costs its separator and header line
+        overhead = 0 if block is not None else len(BLOCK_SEPARATOR if blocks else "") + len(_header(doc))
+        size = len(doc.page_content) + overhead
+        if used + size > char_budget:
+            remaining = char_budget - used - overhead
+            if remaining < MIN_PARTIAL_TOKENS * 4:
+                break
+            text = _truncate(doc.page_content, remaining // 4)
+            metadata = dict(doc.metadata or {})
+            if "start_index" in metadata:
+                metadata["end_index"] = metadata["start_index"] + len(text)
+            doc = Document(page_content=text, metadata=metadata)
+            if block is not None and not block.accepts(doc):
+                # The cut chunk no longer reaches the block; it needs its own header
+                block = None
+                overhead = len(BLOCK_SEPARATOR) + len(_header(doc))
+            size = len(text) + overhead
+            if used + size > char_budget:
+                break
+
+        if block is not None:
+            block.merge(doc)
+        else:
+            blocks.append(_Block(doc))
+        used += size
+        if used >= char_budget:
+            break
+
+    context = BLOCK_SEPARATOR.join(block.render() for block in blocks)
+    CONTEXT_TOKENS.observe(estimate_tokens(context))
+    return context
@@ -0,0 +1,88 @@
+import os
+import re
+from typing import List
+
+from langchain_core.documents import Document
+
+from rag.metrics import DEDUPED_CHARS
+
+# Repeated lines shorter than this (headings, "Apply Now") are left alone
+DEDUPE_MIN_CHARS = int(os.getenv("DEDUPE_MIN_CHARS", "40"))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def _span(doc: Document):
+    """(source key, start, end) of a chunk in its source, or None without start_index"""
+    metadata = doc.metadata or {}
+    if "start_index" not in metadata:
+        return None
+    start = metadata["start_index"]
+    end = metadata.get("end_index", start + len(doc.page_content))
+    return (metadata.get("source"), metadata.get("page")), start, end
+
+
+def _trim_overlap(doc: Document, kept_spans):
+    """
+    Cut the part of doc that a higher-ranked chunk of the same source already
+    covers (the chunk_overlap window). Returns None if nothing new is left.
+    """
+    span = _span(doc)
+    if span is None:
+        return doc
+    key, start, end = span
+    text = doc.page_content
+    for kept_key, kept_start, kept_end in kept_spans:
+        if kept_key != key or kept_end <= start or end <= kept_start:
+            continue
+        if kept_start <= start and end <= kept_end:
+            return None
+        if kept_start <= start < kept_end:
+            text = text[kept_end - start:]
+            start = kept_end
+        elif kept_start < end <= kept_end:
+            text = text[:kept_start - start]
+            end = kept_start
+    kept_spans.append((key, start, end))
+    return Document(page_content=text, metadata={**doc.metadata, "start_index": start, "end_index": end})
+
+
+def _drop_seen_lines(text: str, seen) -> str:
+    """Remove lines already present in an earlier chunk (crawled-page boilerplate)"""
+    parts = re.split(r"(\n+)", text)
+    kept = []
+    for i in range(0, len(parts), 2):
+        line = parts[i]
+        separator = parts[i + 1] if i + 1 < len(parts) else ""
+        key = _normalize(line)
+        if len(key) >= DEDUPE_MIN_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line + separator)
+    return "".join(kept)
+
+
+def dedupe_chunks(documents: List[Document]) -> List[Document]:
+    """
+    Remove duplicate text from chunks in rank order: overlap windows shared
+    with a better-ranked chunk of the same source, then lines repeated across
+    chunks. Chunks with nothing new left are dropped.
+    """
+    kept_spans = []
+    seen = set()
+    result = []
+    removed = 0
+    for doc in documents:
+        trimmed = _trim_overlap(doc, kept_spans)
+        if trimmed is None:
+            removed += len(doc.page_content)
+            continue
+        text = _drop_seen_lines(trimmed.page_content, seen)
+        removed += len(doc.page_content) - len(text)
+        if text.strip():
+            result.append(Document(page_content=text, metadata=trimmed.metadata))
+    DEDUPED_CHARS.observe(removed)
+    return result
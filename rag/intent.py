@@ -0,0 +1,115 @@
+import os
+import re
+from typing import Optional
+
+# "canned": fixed replies for greetings/thanks/goodbyes, short LLM prompt for other chit-chat
+# "llm": short LLM prompt (no retrieval) for all small talk
+SMALL_TALK_MODE = os.getenv("SMALL_TALK_MODE", "canned").lower()
+# Longer messages are treated as real questions even if they open with a greeting
+SMALL_TALK_MAX_WORDS = int(os.getenv("SMALL_TALK_MAX_WORDS", "8"))
+
+# Follow-ups this short, or using these words, are rewritten into a
+# standalone question before retrieval when the session has history
+FOLLOW_UP_MAX_WORDS = int(os.getenv("FOLLOW_UP_MAX_WORDS", "4"))
+FOLLOW_UP_WORDS = {
+    "it", "its", "it's", "they", "them", "their", "theirs", "this", "that", "these", "those",
+    "he", "him", "his", "she", "her", "there", "same", "above", "previous", "former", "latter",
+    "also", "else", "more", "another", "other", "which", "one", "ones",
+}
+# Chit-chat words that, with history, point back at the conversation ("is it today?")
+REFERRING_WORDS = FOLLOW_UP_WORDS | {"today", "tomorrow"}
+
+# Every word of a small-talk message must come from these sets
+GREETING_WORDS = {
+    "hi", "hii", "hello", "helo", "hey", "heya", "hiya", "yo", "salam", "salaam", "assalam",
+    "asalam", "assalamu", "assalamualaikum", "asalamualaikum", "aoa", "o", "u", "alaikum",
+    "alaykum", "walaikum", "wa", "good", "morning", "afternoon", "evening", "greetings",
+    "there", "bot", "muetbot", "dear",
+}
+THANKS_WORDS = {
+    "thanks", "thank", "thankyou", "thx", "ty", "you", "so", "much", "a", "lot", "very",
+    "great", "ok", "okay", "nice", "cool", "awesome", "perfect", "got", "it", "shukriya",
+    "jazakallah", "appreciated", "helpful", "that", "was", "for", "the", "help",
+}
+FAREWELL_WORDS = {
+    "bye", "goodbye", "good", "night", "see", "you", "later", "take", "care", "allah",
+    "hafiz", "khuda", "ok", "okay", "cya", "tc",
+}
+CHITCHAT_WORDS = {
+    "how", "are", "you", "u", "r", "doing", "is", "it", "going", "what", "s", "up", "whats",
+    "sup", "who", "your", "name", "can", "do", "i", "am", "fine", "im", "good", "well", "and",
+    "nice", "to", "meet", "hi", "hello", "hey", "today", "there", "kaise", "ho", "kya", "haal",
+    "hai", "aap",
+}
+
+# Canned replies (no retrieval, no LLM call)
+CANNED_RESPONSES = {
+    "greeting": (
+        "Hello! 👋 I'm MUETBOT, the official AI assistant of Mehran University of "
+        "Engineering and Technology. I can help with admissions, programs, departments, "
+        "news, events and jobs at MUET. How can I help you today?"
+    ),
+    "thanks": "You're welcome! 😊 Let me know if there's anything else you'd like to know about MUET.",
+    "farewell": "Goodbye! 👋 Feel free to come back anytime you have questions about MUET.",
+}
+
+
+def _words(query: str):
+    return re.findall(r"[a-z]+", query.casefold())
+
+
+def classify_small_talk(query: str) -> Optional[str]:
+    """
+    Return "greeting", "thanks", "farewell" or "chitchat" if the message is
+    small talk that needs no MUET documents, else None (an information query)
+    """
+    words = _words(query)
+    if not words or len(words) > SMALL_TALK_MAX_WORDS:
+        return None
+
+    vocabulary = set(words)
+    if vocabulary <= GREETING_WORDS:
+        return "greeting"
+    if vocabulary <= THANKS_WORDS and vocabulary & {"thanks", "thank", "thankyou", "thx", "ty", "shukriya", "jazakallah"}:
+        return "thanks"
+    if vocabulary <= FAREWELL_WORDS and vocabulary & {"bye", "goodbye", "later", "hafiz", "cya", "night", "care"}:
+        return "farewell"
+    if vocabulary <= CHITCHAT_WORDS | GREETING_WORDS:
+        return "chitchat"
+    return None
+
+
+def is_small_talk(query) -> bool:
+    message = question_of(query)
+    if not isinstance(message, str):
+        return False
+    kind = classify_small_talk(message)
+    # With history, "is it today?" or "what is it?" is a follow-up, not chit-chat:
+    # it goes through the rewrite and retrieval. Greetings/thanks/goodbyes stay small talk.
+    if kind == "chitchat" and needs_rewrite(query) and set(_words(message)) & REFERRING_WORDS:
+        return False
+    return kind is not None
+
+
+def question_of(query) -> str:
+    """The user's message, for plain-string or {"question", "history"} inputs"""
+    return query["question"] if isinstance(query, dict) else query
+
+
+def needs_rewrite(query) -> bool:
+    """
+    True for follow-ups that only make sense with the conversation before
+    them ("what about its fee?", "and the deadline?"). Self-contained
+    questions skip the rewrite LLM call.
+    """
+    if not isinstance(query, dict) or not query.get("history"):
+        return False
+    words = _words(query["question"])
+    return len(words) <= FOLLOW_UP_MAX_WORDS or bool(set(words) & FOLLOW_UP_WORDS)
+
+
+def canned_response(query: str) -> Optional[str]:
+    """Fixed reply for the message, or None if it should go to the small-talk prompt"""
+    if SMALL_TALK_MODE != "canned":
+        return None
+    return CANNED_RESPONSES.get(classify_small_talk(query))
@@ -0,0 +1,89 @@
+import math
+import re
+import heapq
+from collections import Counter, defaultdict
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Only very common function words are dropped; codes and numbers ("BE", "IT", "2026", "CS-101") are kept
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "for", "from", "how", "i", "in", "is",
+    "me", "of", "on", "or", "the", "to", "was", "what", "when", "where", "which", "who",
+    "with", "about", "can", "do", "does", "tell", "please",
+}
+
+
+def tokenize(text: str, keep_stopwords: bool = False) -> List[str]:
+    tokens = re.findall(r"[a-z0-9]+", text.casefold())
+    if keep_stopwords:
+        return tokens
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 scoring over the indexed chunks.
+    Catches exact tokens dense search misses: department codes, circular
+    numbers, years and names.
+    """
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.doc_lengths = []
+        for index, doc in enumerate(documents):
+            # Stopwords are kept in the index for queries made only of them
+            counts = Counter(tokenize(doc.page_content, keep_stopwords=True))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings[term].append((index, frequency))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def __len__(self):
+        return len(self.documents)
+
+    @classmethod
+    def from_vectordb(cls, vectordb):
+        """Index the same chunks that are stored in the Chroma collection"""
+        data = vectordb.get(include=["documents", "metadatas"])
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])
+            if text
+        ]
+        return cls(documents)
+
+    def _idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.documents) - df + 0.5) / (df + 0.5))
+
+    def _accepts(self, index, allowed, since):
+        metadata = self.documents[index].metadata
+        if allowed is not None and metadata.get("source_type") not in allowed:
+            return False
+        return since is None or metadata.get("published_ts", -1) >= since
+
+    def search(self, query: str, k: int = 10, source_types: Optional[List[str]] = None,
+               since: Optional[int] = None) -> List[Tuple[Document, float]]:
+        """
+        Top-k (document, BM25 score) pairs, best first, optionally only from
+        source_types and published at or after since (epoch seconds)
+        """
+        terms = tokenize(query) or tokenize(query, keep_stopwords=True)
+        allowed = set(source_types) if source_types else None
+        scores = defaultdict(float)
+        for term in set(terms):
+            idf = self._idf(term)
+            for index, frequency in self.postings.get(term, ()):
+                if (allowed is not None or since is not None) and not self._accepts(index, allowed, since):
+                    continue
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[index] / (self.avg_length or 1)
+                scores[index] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.documents[index], score) for index, score in best]
@@ -0,0 +1,313 @@
+import time
+import threading
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds; covers cache hits (ms) up to slow Gemini generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 10, 15, 20, 30)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) when no usage data is available"""
+    return max(len(text) // 4, 1) if text else 0
+
+
+def _label_key(labels: Dict[str, str]):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+# ============================================================
+# Metric Types (Prometheus text exposition format)
+# ============================================================
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is computed by a function at scrape time"""
+
+    def __init__(self, name, help_text, collect):
+        self.name = name
+        self.help_text = help_text
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(_label_key(labels))} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "muetbot_requests_total", "Chat requests by endpoint"))
+REQUEST_ERRORS = REGISTRY.register(Counter(
+    "muetbot_request_errors_total", "Failed chat requests by endpoint and status"))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "muetbot_request_latency_seconds", "End-to-end chat request latency by endpoint"))
+TIME_TO_FIRST_TOKEN = REGISTRY.register(Histogram(
+    "muetbot_time_to_first_token_seconds", "Time until the first streamed answer token"))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "muetbot_stage_latency_seconds",
+    "RAG chain stage latency (query_rewrite, retriever, rerank, dedupe, pack_context, prompt, llm, parser, rag_chain)"))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "muetbot_stage_errors_total", "RAG chain stage failures"))
+RETRIEVED_DOCUMENTS = REGISTRY.register(Histogram(
+    "muetbot_retrieved_documents", "Documents returned by the retriever per query", COUNT_BUCKETS))
+PROMPT_CHARS = REGISTRY.register(Histogram(
+    "muetbot_prompt_chars", "Characters sent to the LLM per call", SIZE_BUCKETS))
+PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "muetbot_prompt_tokens", "Input tokens per LLM call (reported usage, else estimated)", SIZE_BUCKETS))
+COMPLETION_TOKENS = REGISTRY.register(Histogram(
+    "muetbot_completion_tokens", "Output tokens per LLM call (reported usage, else estimated)", SIZE_BUCKETS))
+CONTEXT_TOKENS = REGISTRY.register(Histogram(
+    "muetbot_context_tokens", "Estimated context tokens packed into the prompt per question", SIZE_BUCKETS))
+DEDUPED_CHARS = REGISTRY.register(Histogram(
+    "muetbot_deduped_chars", "Duplicate context characters removed before the prompt", SIZE_BUCKETS))
+INTENTS = REGISTRY.register(Counter(
+    "muetbot_small_talk_total", "Messages answered by the small-talk fast path, by intent"))
+ROUTES = REGISTRY.register(Counter(
+    "muetbot_routes_total", "Retrieval queries by routed partition (news/admissions/all)"))
+SINGLEFLIGHT_COALESCED = REGISTRY.register(Counter(
+    "muetbot_singleflight_coalesced_total", "Requests that joined an identical in-flight query (chain runs saved)"))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "muetbot_cache_lookups_total", "Cache lookups by cache and result (hit/miss)"))
+
+
+def _cache_hit_ratios():
+    caches = sorted({dict(key)["cache"] for key in CACHE_LOOKUPS._values})
+    for name in caches:
+        hits = CACHE_LOOKUPS.value(cache=name, result="hit")
+        total = hits + CACHE_LOOKUPS.value(cache=name, result="miss")
+        yield {"cache": name}, hits / total if total else 0.0
+
+
+REGISTRY.register(Gauge("muetbot_cache_hit_ratio", "Cache hit ratio since start", _cache_hit_ratios))
+
+
+def record_cache_lookup(cache_name: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+# ============================================================
+# Chain Instrumentation
+# ============================================================
+# Chain steps are named with .with_config(run_name=...) in rag/chain.py
+CHAIN_STAGES = {"query_rewrite", "rerank", "dedupe", "pack_context", "prompt", "parser", "rag_chain"}
+
+
+class StageCallbackHandler(BaseCallbackHandler):
+    """
+    Times the named chain stages, retriever and LLM calls from LangChain
+    callback events, so it works for invoke, ainvoke, stream and astream
+    alike. Subclasses decide what to record.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self._starts: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def record_stage(self, stage: str, seconds: float, error: bool):
+        pass
+
+    def record_documents(self, documents):
+        pass
+
+    def record_output(self, stage: str, outputs):
+        """Output of a named chain stage (e.g. the chunks kept, the packed context)"""
+        pass
+
+    def record_llm_call(self, response, prompt_chars: int):
+        pass
+
+    def _start(self, run_id, stage, prompt_chars=0):
+        with self._lock:
+            self._starts[run_id] = (stage, time.perf_counter(), prompt_chars)
+
+    def _end(self, run_id, error=False) -> Optional[tuple]:
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+        if started is None:
+            return None
+        stage, start, _ = started
+        self.record_stage(stage, time.perf_counter() - start, error)
+        return started
+
+    # --- chain steps (query_rewrite, rerank, dedupe, pack_context, prompt, parser, whole chain) ---
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs: Any):
+        name = kwargs.get("name")
+        if name in CHAIN_STAGES:
+            self._start(run_id, name)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs: Any):
+        started = self._end(run_id)
+        if started:
+            self.record_output(started[0], outputs)
+
+    def on_chain_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error=True)
+
+    # --- retriever ---
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs: Any):
+        self._start(run_id, "retriever")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs: Any):
+        self._end(run_id)
+        self.record_documents(documents)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error=True)
+
+    # --- LLM ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any):
+        chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._start(run_id, "llm", chars)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs: Any):
+        self._start(run_id, "llm", sum(len(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any):
+        started = self._end(run_id)
+        self.record_llm_call(response, started[2] if started else 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, error=True)
+
+
+class MetricsCallbackHandler(StageCallbackHandler):
+    """Records per-stage latency and size metrics into the Prometheus registry"""
+
+    def record_stage(self, stage, seconds, error):
+        if error:
+            STAGE_ERRORS.inc(stage=stage)
+        else:
+            STAGE_LATENCY.observe(seconds, stage=stage)
+
+    def record_documents(self, documents):
+        RETRIEVED_DOCUMENTS.observe(len(documents))
+
+    def record_llm_call(self, response, prompt_chars):
+        usage = {}
+        output_text = ""
+        for generations in response.generations:
+            for generation in generations:
+                output_text += generation.text
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+
+        PROMPT_CHARS.observe(prompt_chars)
+        PROMPT_TOKENS.observe(usage.get("input_tokens") or max(prompt_chars // 4, 1))
+        COMPLETION_TOKENS.observe(usage.get("output_tokens") or estimate_tokens(output_text))
+
+
+class TraceCallbackHandler(StageCallbackHandler):
+    """
+    Collects one run's stage timings and retrieved documents; pass it in
+    the run's config callbacks (used by the batch CLI)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.timings: Dict[str, float] = {}
+        self.errors = []
+        self.documents = []
+        self.selected = None
+        self.context_tokens = None
+
+    def record_stage(self, stage, seconds, error):
+        with self._lock:
+            # Stages that run twice (e.g. llm for query rewrite + answer) add up
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+            if error:
+                self.errors.append(stage)
+
+    def record_documents(self, documents):
+        with self._lock:
+            self.documents.extend(documents)
+
+    def record_output(self, stage, outputs):
+        with self._lock:
+            if stage in ("rerank", "dedupe"):
+                # Chunks that survive both stages are the ones that reach the prompt
+                self.selected = list(outputs)
+            elif stage == "pack_context":
+                self.context_tokens = estimate_tokens(outputs)
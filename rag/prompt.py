@@ -18,6 +18,9 @@ Current Date/Time in Pakistan: {date_time}
 CONTEXT FROM MUET DOCUMENTS:
 {content}
 
+### CONVERSATION SO FAR
+{history}
+
 ### USER QUERY
 {question}
 
@@ -27,6 +30,7 @@ CONTEXT FROM MUET DOCUMENTS:
 - For **GREETINGS** (hello, hi, hey, assalam o alaikum, etc.): Respond warmly and naturally. Introduce yourself briefly and ask how you can help. Do NOT use the structured format for greetings.
 - For **CASUAL CHAT** (how are you, thank you, goodbye, etc.): Respond naturally and conversationally like a friendly assistant.
 - For **INFORMATION QUERIES**: Use the structured format below.
+- For **FOLLOW-UPS**: Use the conversation so far to resolve what the user refers to ("it", "that program", "the deadline"), but take facts only from the Context.
 
 **2. INFORMATION QUERY INSTRUCTIONS:**
 - **Strict Context Adherence**: Base your answer ONLY on the provided Context. If information is missing, say: "I don't have that specific information in my current data. You can check the official MUET website for more details."
@@ -63,7 +67,39 @@ YOUR RESPONSE:
 """
 
     prompt_template = PromptTemplate(
-        input_variables=["content", "question", "date_time"],
+        input_variables=["content", "question", "date_time", "history"],
+        template=template
+    )
+    return prompt_template
+
+def small_talk_templete():
+    print("creating small talk prompt templete")
+    template = """You are MUETBOT, the friendly official AI assistant of Mehran University of Engineering and Technology (MUET), Jamshoro.
+You help with admissions, programs, departments, news, events and jobs at MUET.
+Reply to the user's casual message warmly and briefly (1-3 sentences), without headers or structured format, and offer help with MUET information.
+
+User: {question}
+MUETBOT:"""
+
+    prompt_template = PromptTemplate(
+        input_variables=["question"],
+        template=template
+    )
+    return prompt_template
+
+def rewrite_templete():
+    print("creating query rewrite templete")
+    template = """Given the conversation below and a follow-up message, rewrite the follow-up as a standalone search query about Mehran University of Engineering and Technology (MUET).
+Resolve references such as "it", "that program" or "the deadline" using the conversation. Keep it short, do not answer it, and return only the query.
+
+Conversation:
+{history}
+
+Follow-up message: {question}
+Standalone query:"""
+
+    prompt_template = PromptTemplate(
+        input_variables=["history", "question"],
         template=template
     )
-    return prompt_template
\ No newline at end of file
+    return prompt_template
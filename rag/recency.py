@@ -0,0 +1,66 @@
+import os
+import re
+import time
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+# Time-decay boost for news-type queries: an article's freshness halves every
+# RECENCY_HALF_LIFE_DAYS, counted back from the newest candidate article
+RECENCY_HALF_LIFE_DAYS = float(os.getenv("RECENCY_HALF_LIFE_DAYS", "30"))
+# Weight of freshness against the (0-1 normalised) relevance score
+RECENCY_WEIGHT = float(os.getenv("RECENCY_WEIGHT", "0.5"))
+# "latest"/"upcoming" news queries only search articles from this many days back
+# (falls back to all articles if none are that recent)
+RECENCY_SINCE_DAYS = int(os.getenv("RECENCY_SINCE_DAYS", "180"))
+
+RECENT_WORDS = {
+    "latest", "recent", "recently", "upcoming", "new", "newest", "current", "currently",
+    "ongoing", "today", "tomorrow", "now", "soon", "week", "month",
+}
+
+SECONDS_PER_DAY = 86400
+
+
+def is_recent_query(query: str) -> bool:
+    return bool(set(re.findall(r"[a-z]+", query.casefold())) & RECENT_WORDS)
+
+
+def since_timestamp(query: str, now: Optional[float] = None) -> Optional[int]:
+    """Earliest publish time (epoch seconds) to search for the query, or None for no limit"""
+    if RECENCY_SINCE_DAYS <= 0 or not is_recent_query(query):
+        return None
+    return int((now or time.time()) - RECENCY_SINCE_DAYS * SECONDS_PER_DAY)
+
+
+def boost_recent(documents: List[Document]) -> List[Document]:
+    """
+    Re-rank candidates by relevance plus freshness. Relevance is the chunk's
+    score min-max normalised over the candidates (rank order if unscored),
+    so it works the same for every reranker. Undated chunks get no boost.
+    """
+    published = [(doc.metadata or {}).get("published_ts") for doc in documents]
+    if RECENCY_WEIGHT <= 0 or not any(ts is not None for ts in published):
+        return documents
+
+    n = len(documents)
+    scores = [(doc.metadata or {}).get("score") for doc in documents]
+    if any(score is None for score in scores):
+        scores = [1.0 - rank / n for rank in range(n)]
+    low, high = min(scores), max(scores)
+    newest = max(ts for ts in published if ts is not None)
+
+    ranked = []
+    for rank, (doc, score, ts) in enumerate(zip(documents, scores, published)):
+        relevance = (score - low) / (high - low) if high > low else 1.0
+        freshness = 0.0
+        if ts is not None:
+            age_days = (newest - ts) / SECONDS_PER_DAY
+            freshness = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+        ranked.append((relevance + RECENCY_WEIGHT * freshness, rank, doc))
+
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return [
+        Document(page_content=doc.page_content, metadata={**doc.metadata, "score": score})
+        for score, _, doc in ranked
+    ]
@@ -0,0 +1,92 @@
+import os
+import math
+from collections import Counter
+from typing import List
+
+from langchain_core.documents import Document
+
+from rag.lexical import tokenize
+
+# "lexical": query-term overlap scorer (no model, CPU only)
+# "cross-encoder": local sentence-transformers cross-encoder (falls back to lexical)
+# "none": keep the retriever's order and k
+RERANKER = os.getenv("RERANKER", "lexical").lower()
+# Candidates over-fetched from the retriever, and how many reach the prompt
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# Weight of the retriever's own ranking in the lexical score (breaks ties, keeps dense signal)
+RETRIEVAL_RANK_WEIGHT = 0.3
+PHRASE_WEIGHT = 0.5
+
+
+def _bigrams(tokens):
+    return set(zip(tokens, tokens[1:]))
+
+
+class LexicalReranker:
+    """
+    Scores each candidate by the idf-weighted share of query terms it
+    contains (idf over the candidate set), plus matching query bigrams,
+    plus a little of the retriever's original rank.
+    """
+
+    def rerank(self, query: str, documents: List[Document], top_n: int) -> List[Document]:
+        query_terms = tokenize(query) or tokenize(query, keep_stopwords=True)
+        if not documents or not query_terms:
+            return documents[:top_n]
+
+        doc_terms = [Counter(tokenize(doc.page_content, keep_stopwords=True)) for doc in documents]
+        n = len(documents)
+        weights = {
+            term: math.log(1 + (n + 1) / (1 + sum(term in terms for terms in doc_terms)))
+            for term in set(query_terms)
+        }
+        total_weight = sum(weights.values()) or 1.0
+        query_bigrams = _bigrams(tokenize(query, keep_stopwords=True))
+
+        scored = []
+        for rank, (doc, terms) in enumerate(zip(documents, doc_terms)):
+            coverage = sum(weight for term, weight in weights.items() if terms[term]) / total_weight
+            phrase = 0.0
+            if query_bigrams:
+                phrase = len(query_bigrams & _bigrams(tokenize(doc.page_content, keep_stopwords=True))) / len(query_bigrams)
+            prior = 1.0 - rank / n
+            scored.append((coverage + PHRASE_WEIGHT * phrase + RETRIEVAL_RANK_WEIGHT * prior, rank, doc))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [_with_score(doc, score) for score, _, doc in scored[:top_n]]
+
+
+class CrossEncoderReranker:
+    """Local cross-encoder (sentence-transformers); scores (query, chunk) pairs on CPU"""
+
+    def __init__(self, model_name: str = RERANK_MODEL):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def rerank(self, query: str, documents: List[Document], top_n: int) -> List[Document]:
+        if not documents:
+            return documents
+        scores = self.model.predict([(query, doc.page_content) for doc in documents])
+        ranked = sorted(zip(scores, range(len(documents)), documents), key=lambda item: (-item[0], item[1]))
+        return [_with_score(doc, float(score)) for score, _, doc in ranked[:top_n]]
+
+
+def _with_score(doc: Document, score: float) -> Document:
+    return Document(page_content=doc.page_content, metadata={**doc.metadata, "score": score})
+
+
+def get_reranker():
+    """Reranker configured by RERANKER, or None to skip the stage"""
+    if RERANKER == "none":
+        return None
+    if RERANKER == "cross-encoder":
+        try:
+            reranker = CrossEncoderReranker()
+            print(f"Cross-encoder reranker loaded: {RERANK_MODEL}")
+            return reranker
+        except Exception as e:
+            print(f"⚠️ Cross-encoder reranker unavailable ({e}); using lexical reranker")
+    return LexicalReranker()
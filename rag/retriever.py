@@ -1,15 +1,212 @@
+import os
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag.lexical import BM25Index
+from rag.metrics import ROUTES
+from rag.recency import since_timestamp
+from rag.rerank import RERANKER, RERANK_CANDIDATES, RERANK_TOP_N
+from rag.router import QUERY_ROUTING, route_name, route_query
+
+# "hybrid": BM25 + dense search fused with reciprocal rank fusion; "dense": Chroma only
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "10"))
+# Candidates taken from each list before fusion
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+# Standard RRF damping constant; higher values flatten the rank weights
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Maximal marginal relevance for the dense search: trade relevance for diversity
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "false").lower() in ("1", "true", "yes")
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "40"))
+# 1.0 = pure relevance, 0.0 = pure diversity
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+
+
+def _source_filter(source_types: Optional[List[str]], since: Optional[int] = None):
+    """Chroma where filter restricting the search to partitions and a publish date"""
+    conditions = []
+    if source_types:
+        conditions.append({"source_type": {"$in": source_types}})
+    if since is not None:
+        conditions.append({"published_ts": {"$gte": since}})
+    if not conditions:
+        return {}
+    return {"filter": conditions[0] if len(conditions) == 1 else {"$and": conditions}}
+
+
+def dense_search(vectordb, query: str, k: int, source_types: Optional[List[str]] = None,
+                 since: Optional[int] = None) -> List[Document]:
+    if RETRIEVAL_MMR:
+        return vectordb.max_marginal_relevance_search(
+            query, k=k, fetch_k=max(MMR_FETCH_K, k), lambda_mult=MMR_LAMBDA, **_source_filter(source_types, since)
+        )
+    return vectordb.similarity_search(query, k=k, **_source_filter(source_types, since))
+
+
+async def adense_search(vectordb, query: str, k: int, source_types: Optional[List[str]] = None,
+                        since: Optional[int] = None) -> List[Document]:
+    if RETRIEVAL_MMR:
+        return await vectordb.amax_marginal_relevance_search(
+            query, k=k, fetch_k=max(MMR_FETCH_K, k), lambda_mult=MMR_LAMBDA, **_source_filter(source_types, since)
+        )
+    return await vectordb.asimilarity_search(query, k=k, **_source_filter(source_types, since))
+
+
+def index_has_source_types(vectordb) -> bool:
+    """True if the index was built with source_type tags (indexes from older builds are not)"""
+    data = vectordb.get(limit=1, include=["metadatas"])
+    return bool(data["metadatas"]) and "source_type" in (data["metadatas"][0] or {})
+
+
+def search_plan(query: str, routing: bool) -> List[Tuple[Optional[List[str]], Optional[int]]]:
+    """
+    (source types, published since) filters to try in order, narrowest first,
+    ending with the whole index. Retrieval stops at the first that finds anything.
+    """
+    source_types = route_query(query) if routing else None
+    ROUTES.inc(route=route_name(source_types))
+    plan = []
+    if source_types:
+        since = since_timestamp(query) if route_name(source_types) == "news" else None
+        if since is not None:
+            plan.append((source_types, since))
+        plan.append((source_types, None))
+    plan.append((None, None))
+    return plan
+
+
+class AsyncChromaRetriever(BaseRetriever):
+    """
+    Retriever over a Chroma vector store that never blocks the event loop.
+    The sync path searches directly; the async path runs the search (query
+    embedding + Chroma lookup) through the vector store's async API.
+    """
+    vectordb: Any
+    k: int = 10
+    # Search only the partitions the query is routed to
+    routing: bool = False
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        for source_types, since in search_plan(query, self.routing):
+            documents = dense_search(self.vectordb, query, self.k, source_types, since)
+            if documents:
+                break
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        for source_types, since in search_plan(query, self.routing):
+            documents = await adense_search(self.vectordb, query, self.k, source_types, since)
+            if documents:
+                break
+        return documents
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """
+    Fuse ranked lists: each chunk scores sum(1 / (rrf_k + rank)) over the
+    lists it appears in. The fused score is kept in metadata["score"].
+    """
+    scores = {}
+    documents = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = (doc.metadata.get("source"), doc.page_content)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [
+        Document(page_content=documents[key].page_content,
+                 metadata={**documents[key].metadata, "score": scores[key]})
+        for key in best
+    ]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense Chroma search plus BM25 over the same chunks, fused with
+    reciprocal rank fusion. The lexical side runs in memory and is cheap.
+    """
+    vectordb: Any
+    lexical_index: Any
+    k: int = RETRIEVER_K
+    fetch_k: int = HYBRID_FETCH_K
+    # Search only the partitions the query is routed to
+    routing: bool = False
+
+    def _lexical(self, query, source_types=None, since=None):
+        return [doc for doc, _ in self.lexical_index.search(query, self.fetch_k, source_types, since)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        for source_types, since in search_plan(query, self.routing):
+            dense = dense_search(self.vectordb, query, self.fetch_k, source_types, since)
+            documents = reciprocal_rank_fusion([dense, self._lexical(query, source_types, since)], self.k)
+            if documents:
+                break
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        for source_types, since in search_plan(query, self.routing):
+            dense = await adense_search(self.vectordb, query, self.fetch_k, source_types, since)
+            documents = reciprocal_rank_fusion([dense, self._lexical(query, source_types, since)], self.k)
+            if documents:
+                break
+        return documents
+
+
+def source_id(doc: Document) -> str:
+    """Stable id of a retrieved chunk: source file (or news article link), PDF page and offset in the source"""
+    metadata = doc.metadata or {}
+    source = metadata.get("source", "unknown")
+    if "page" in metadata:
+        source += f":page{metadata['page']}"
+    if "start_index" in metadata:
+        source += f"#{metadata['start_index']}"
+    return source
+
+
 def get_retriever(vectordb):
     print("getting retriever")
     # Check database has documents
     doc_count = vectordb._collection.count()
     print(f"Vector DB contains {doc_count} documents")
-    
+
     if doc_count == 0:
         print("⚠️ WARNING: Vector database is empty! Retrieval will not work.")
-    
-    retriever = vectordb.as_retriever(search_kwargs={"k": 10})
+
+    # With a rerank stage the retriever over-fetches and the reranker keeps the best
+    k = RERANK_CANDIDATES if RERANKER != "none" else RETRIEVER_K
+    if k < RERANK_TOP_N:
+        print(f"⚠️ Retriever k={k} is below RERANK_TOP_N={RERANK_TOP_N}; fetching {RERANK_TOP_N} candidates")
+        k = RERANK_TOP_N
+
+    routing = QUERY_ROUTING and doc_count > 0 and index_has_source_types(vectordb)
+    if QUERY_ROUTING and doc_count > 0 and not routing:
+        print("⚠️ Index has no source_type tags (built by an older version); query routing disabled until it is rebuilt")
+
+    if RETRIEVAL_MODE == "hybrid" and doc_count > 0:
+        lexical_index = BM25Index.from_vectordb(vectordb)
+        print(f"BM25 index built over {len(lexical_index)} chunks")
+        retriever = HybridRetriever(vectordb=vectordb, lexical_index=lexical_index, k=k,
+                                    fetch_k=max(HYBRID_FETCH_K, k), routing=routing)
+    else:
+        retriever = AsyncChromaRetriever(vectordb=vectordb, k=k, routing=routing)
     print("="*50)
     print(retriever)
     print("="*50)
 
-    return retriever
\ No newline at end of file
+    return retriever
@@ -0,0 +1,49 @@
+import os
+import re
+from typing import List, Optional
+
+# Send each query only to the corpus partitions (chunk metadata "source_type")
+# it is about. Unclear or mixed queries search everything.
+QUERY_ROUTING = os.getenv("QUERY_ROUTING", "true").lower() in ("1", "true", "yes")
+
+# Route -> source types searched for it
+ROUTES = {
+    "news": ["news"],
+    "admissions": ["site", "prospectus"],
+}
+
+# A query matching words of exactly one route is sent to that route
+ROUTE_WORDS = {
+    "news": {
+        "news", "latest", "recent", "recently", "upcoming", "event", "events", "announcement",
+        "announcements", "announced", "circular", "circulars", "notice", "notification",
+        "job", "jobs", "vacancy", "vacancies", "career", "careers", "hiring", "recruitment",
+        "internship", "internships", "tournament", "seminar", "webinar", "workshop",
+        "conference", "ceremony", "competition", "today", "week", "month",
+    },
+    "admissions": {
+        "admission", "admissions", "apply", "eligibility", "eligible", "criteria", "merit",
+        "fee", "fees", "seat", "seats", "quota", "prospectus", "program", "programs",
+        "programme", "programmes", "degree", "degrees", "undergraduate", "postgraduate",
+        "bachelor", "masters", "phd", "syllabus", "curriculum", "course", "courses",
+        "scholarship", "scholarships", "hostel", "test", "entry",
+    },
+}
+
+
+def route_query(query: str) -> Optional[List[str]]:
+    """Source types to search for the query, or None to search the whole index"""
+    if not QUERY_ROUTING:
+        return None
+    words = set(re.findall(r"[a-z]+", query.casefold()))
+    matched = [route for route, vocabulary in ROUTE_WORDS.items() if words & vocabulary]
+    if len(matched) != 1:
+        return None
+    return ROUTES[matched[0]]
+
+
+def route_name(source_types: Optional[List[str]]) -> str:
+    for route, types in ROUTES.items():
+        if types == source_types:
+            return route
+    return "all"
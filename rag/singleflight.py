@@ -0,0 +1,91 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from rag.metrics import SINGLEFLIGHT_COALESCED
+
+
+class _Flight:
+    """One in-flight chain run whose output chunks are shared by all callers"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._event = asyncio.Event()
+
+    def notify(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self):
+        await self._event.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight queries. The first caller for a key runs
+    the work; callers arriving while it is still running subscribe to the
+    same output instead of starting their own retrieval and LLM call.
+    Streaming subscribers receive chunks as the leader produces them.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def __contains__(self, key):
+        return key in self._flights
+
+    def stream(self, key: str, produce: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Yield the output of produce(), shared with identical in-flight calls"""
+        flight = self._flights.get(key)
+        if flight is None:
+            self.leaders += 1
+            flight = _Flight()
+            self._flights[key] = flight
+            # The run is a task of its own so a disconnecting caller cannot cancel it for the others
+            flight.task = asyncio.create_task(self._run(key, flight, produce))
+        else:
+            self.followers += 1
+            SINGLEFLIGHT_COALESCED.inc()
+        return self._follow(flight)
+
+    async def do(self, key: str, produce: Callable[[], AsyncIterator[str]]) -> str:
+        """Like stream(), but return the complete output"""
+        return "".join([chunk async for chunk in self.stream(key, produce)])
+
+    async def _run(self, key, flight, produce):
+        try:
+            async for chunk in produce():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.notify()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    @staticmethod
+    async def _follow(flight) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            while index < len(flight.chunks):
+                yield flight.chunks[index]
+                index += 1
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await flight.wait()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "leader_calls": self.leaders,
+            # Every follower is a retrieval + LLM call that did not happen
+            "calls_saved": self.followers,
+        }
@@ -2,6 +2,9 @@
 # 1. Install Python dependencies
 pip install -r requirements.txt
 
+# Build hashed, precompressed frontend assets into static/dist
+python -m app_main.assets
+
 # 2. Install Playwright browsers and system-level dependencies
 # The --with-deps flag is critical for Linux servers to install missing libraries
 python -m playwright install --with-deps chromium
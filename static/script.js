@@ -20,6 +20,18 @@ let isOpen = false;
 let isFirstOpen = true;
 let isResizing = false;
 
+// Conversation id: the server keeps this tab's history under it
+const SESSION_KEY = 'muetbot-session-id';
+let sessionId = sessionStorage.getItem(SESSION_KEY) || newSessionId();
+
+function newSessionId() {
+    const id = (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : Date.now().toString(36) + Math.random().toString(36).slice(2);
+    sessionStorage.setItem(SESSION_KEY, id);
+    return id;
+}
+
 // ============================================================
 // Resize Functionality (from top-left corner)
 // ============================================================
@@ -106,25 +118,48 @@ async function sendMessage() {
     // Disable send button
     sendBtn.disabled = true;
     
+    let botMessage = null;
+    
     try {
-        const response = await fetch(`${API_URL}/chat`, {
+        const response = await fetch(`${API_URL}/chat/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+                'X-Session-ID': sessionId,
             },
-            body: JSON.stringify({ query: message })
+            body: JSON.stringify({ query: message, session_id: sessionId })
         });
         
-        // Remove typing indicator
-        removeTypingIndicator(typingId);
-        
         if (!response.ok) {
+            removeTypingIndicator(typingId);
             const errorData = await response.json();
             throw new Error(errorData.detail || 'Failed to get response');
         }
         
-        const data = await response.json();
-        addMessage(data.answer, 'bot');
+        // Render tokens as they arrive; the typing indicator stays until the first one
+        let answer = '';
+        await readEventStream(response, (event, data) => {
+            if (event === 'error') {
+                throw new Error(data.detail || 'Failed to get response');
+            }
+            if (data.token) {
+                answer += data.token;
+                if (!botMessage) {
+                    removeTypingIndicator(typingId);
+                    botMessage = addMessage(answer, 'bot');
+                } else {
+                    scheduleMessageUpdate(botMessage, answer);
+                }
+            }
+        });
+        
+        removeTypingIndicator(typingId);
+        if (!botMessage) {
+            addMessage(answer || 'Sorry, I could not generate a response.', 'bot', !answer);
+        } else {
+            updateMessage(botMessage, answer);
+        }
         
     } catch (error) {
         console.error('Error:', error);
@@ -136,6 +171,41 @@ async function sendMessage() {
     }
 }
 
+// ============================================================
+// Read Server-Sent Events from a fetch() response
+// ============================================================
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line; keep any partial event in the buffer
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const rawEvent of events) {
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            if (data) {
+                onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+}
+
 // ============================================================
 // Send Suggestion
 // ============================================================
@@ -164,6 +234,32 @@ function addMessage(text, sender, isError = false) {
     
     chatMessages.appendChild(messageDiv);
     scrollToBottom();
+    
+    return messageDiv;
+}
+
+// ============================================================
+// Update a Message while it is Streaming
+// ============================================================
+let pendingUpdate = null;
+
+function updateMessage(messageDiv, text) {
+    pendingUpdate = null;
+    messageDiv.querySelector('.message-content p').innerHTML = formatMessage(text);
+    scrollToBottom();
+}
+
+function scheduleMessageUpdate(messageDiv, text) {
+    // Re-render at most once per animation frame however fast tokens arrive
+    const shouldSchedule = pendingUpdate === null;
+    pendingUpdate = { messageDiv, text };
+    if (shouldSchedule) {
+        requestAnimationFrame(() => {
+            if (pendingUpdate) {
+                updateMessage(pendingUpdate.messageDiv, pendingUpdate.text);
+            }
+        });
+    }
 }
 
 // ============================================================
@@ -248,6 +344,11 @@ function clearChat() {
     
     // Show quick suggestions again
     quickSuggestions.style.display = 'flex';
+    
+    // Start a fresh conversation on the server too
+    fetch(`${API_URL}/chat/session/${encodeURIComponent(sessionId)}`, { method: 'DELETE' })
+        .catch(() => {});
+    sessionId = newSessionId();
 }
 
 // ============================================================
@@ -1,12 +1,14 @@
 """
 MUET Assistant - Streamlit Chatbot UI
-Independent RAG-based chatbot (no FastAPI required)
+Independent RAG-based chatbot (no FastAPI required), or a thin client
+of the FastAPI backend when MUETBOT_API_URL is set
 Developed by Raza Khan
 """
 
 import os
 import sys
-import base64
+import json
+import uuid
 
 # Prevent DLL/tracing issues
 os.environ["LANGCHAIN_TRACING_V2"] = "false"
@@ -18,9 +20,8 @@ from dotenv import load_dotenv
 # Add project root to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from ingestion import load_docs, embed_store, chunking
-from models import chat_models
-from rag import chain, prompt, retriever
+from app_main.client import MUETBOT_API_URL, ChatAPIError, ChatClient
+from app_main.sessions import ConversationHistory
 
 load_dotenv()
 
@@ -35,22 +36,32 @@ st.set_page_config(
 )
 
 # ============================================================
-# Load Background Image
+# Background Image
 # ============================================================
-def get_base64_image(image_path):
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except FileNotFoundError:
-        return None
-
-bg_image_path = os.path.join("static", "muet-bg.jpg")
-bg_base64 = get_base64_image(bg_image_path)
+# Served by Streamlit from ./static (enableStaticServing in .streamlit/config.toml),
+# so the browser downloads and caches it once instead of on every rerun
+STATIC_URL = "app/static"
 
-if bg_base64:
-    bg_style = f'background-image: url("data:image/jpg;base64,{bg_base64}"); background-size: cover; background-position: center; background-attachment: fixed;'
-else:
-    bg_style = 'background: linear-gradient(135deg, #1a365d 0%, #002147 100%);'
+@st.cache_data(show_spinner=False)
+def get_background_style():
+    """CSS background for the page, preferring the resized WebP/JPEG from python -m app_main.assets"""
+    try:
+        with open(os.path.join("static", "dist", "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        widths = sorted(int(name[len("muet-bg-"):-len(".jpg")]) for name in manifest
+                        if name.startswith("muet-bg-") and name.endswith(".jpg"))
+        width = widths[-1]
+        webp = f"{STATIC_URL}/dist/{manifest[f'muet-bg-{width}.webp']}"
+        jpg = f"{STATIC_URL}/dist/{manifest[f'muet-bg-{width}.jpg']}"
+        image = (f'background-image: url("{jpg}"); '
+                 f'background-image: image-set(url("{webp}") type("image/webp"), url("{jpg}") type("image/jpeg"));')
+    except (FileNotFoundError, KeyError, ValueError, IndexError):
+        if not os.path.exists(os.path.join("static", "muet-bg.jpg")):
+            return 'background: linear-gradient(135deg, #1a365d 0%, #002147 100%);'
+        image = f'background-image: url("{STATIC_URL}/muet-bg.jpg");'
+    return image + ' background-size: cover; background-position: center; background-attachment: fixed;'
+
+bg_style = get_background_style()
 
 # ============================================================
 # Custom CSS
@@ -438,68 +449,81 @@ div[data-testid="stVerticalBlockBorderWrapper"] > div[style*="overflow"] {{
 # ============================================================
 @st.cache_resource(show_spinner=False)
 def initialize_qa_chain():
-    """Initialize the RAG QA chain - cached for performance"""
-    try:
-        OUTPUT_FILE = os.path.join("data", "website_documents", "muet_data.txt")
-        NEWS_FILE = os.path.join("data", "website_documents", "muet_circular_data.txt")
-        
-        file_paths = [OUTPUT_FILE, NEWS_FILE]
-        
-        all_documents = []
-        for path in file_paths:
-            if os.path.exists(path):
-                all_documents.extend(load_docs.document_loader(path))
-        
-        if not all_documents:
-            return None
-        
-        chunks = chunking.text_splitter(all_documents)
-        embed_model = chat_models.embeddings_model()
-        vectordb = embed_store.vector_database(chunks, embed_model, flag=True)
-        retrievers = retriever.get_retriever(vectordb)
-        chat_model = chat_models.chat_model()
-        prompt_template = prompt.prompt_templete()
-        qa_chain = chain.rag_chain(retrievers, prompt_template, chat_model)
-        
-        return qa_chain
+    """Build the RAG QA chain once per process; every browser session shares it"""
+    OUTPUT_FILE = os.path.join("data", "website_documents", "muet_data.txt")
+    NEWS_FILE = os.path.join("data", "website_documents", "muet_circular_data.txt")
     
-    except Exception as e:
-        st.error(f"❌ Failed to initialize: {str(e)}")
-        return None
+    # Opens the persisted index when there is one, same as the API server
+    from app_main.api import retriever_qa
+    qa_chain = retriever_qa([OUTPUT_FILE, NEWS_FILE], flag=True)
+    if qa_chain is None:
+        # Raising keeps the failure out of the cache so the next rerun retries
+        raise RuntimeError("QA chain could not be built, check the logs")
+    return qa_chain
 
 # ============================================================
 # Session State
 # ============================================================
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "chain_initialized" not in st.session_state:
-    st.session_state.chain_initialized = False
+if "history" not in st.session_state:
+    # Bounded, compacted history sent with each question for follow-ups
+    st.session_state.history = ConversationHistory()
+if "session_id" not in st.session_state:
+    # Thin-client mode: the API server keeps the history under this id
+    st.session_state.session_id = uuid.uuid4().hex
+if MUETBOT_API_URL and "api_client" not in st.session_state:
+    # One keep-alive client per browser session: requests.Session is not
+    # safe to share between the script threads of different users
+    st.session_state.api_client = ChatClient(MUETBOT_API_URL, pool_size=1)
 
 # ============================================================
 # Initialize Chain
 # ============================================================
-if not st.session_state.chain_initialized:
-    with st.spinner("🚀 Initializing MUET Assistant..."):
-        qa_chain = initialize_qa_chain()
-        if qa_chain:
-            st.session_state.chain_initialized = True
-            st.session_state.qa_chain = qa_chain
+qa_chain = None
+api_client = None
+if MUETBOT_API_URL:
+    # The index, embeddings and Gemini client live in the API server only
+    api_client = st.session_state.api_client
+else:
+    try:
+        with st.spinner("🚀 Initializing MUET Assistant..."):
+            qa_chain = initialize_qa_chain()
+    except Exception as e:
+        st.error(f"❌ Failed to initialize: {str(e)}")
 
 # ============================================================
 # Get Response Function
 # ============================================================
-def get_bot_response(query: str) -> str:
+def stream_bot_response(query: str):
+    """Yield answer tokens as Gemini generates them"""
+    if api_client is not None:
+        try:
+            yield from api_client.stream(query, st.session_state.session_id)
+        except ChatAPIError as e:
+            yield f"⚠️ Error: {str(e)}"
+        return
+    
+    if qa_chain is None:
+        yield "⚠️ Chatbot is not initialized. Please refresh the page."
+        return
+    
+    chunks = []
     try:
-        if hasattr(st.session_state, 'qa_chain') and st.session_state.qa_chain:
-            response = st.session_state.qa_chain.invoke(query)
-            return response
-        else:
-            return "⚠️ Chatbot is not initialized. Please refresh the page."
+        for chunk in qa_chain.stream({"question": query, "history": st.session_state.history.render()}):
+            chunks.append(chunk)
+            yield chunk
     except Exception as e:
-        return f"⚠️ Error: {str(e)}"
+        yield f"⚠️ Error: {str(e)}"
+        return
+    st.session_state.history.add_turn(query, "".join(chunks))
 
 def clear_chat():
     st.session_state.messages = []
+    st.session_state.history = ConversationHistory()
+    if api_client is not None:
+        api_client.clear_session(st.session_state.session_id)
+        st.session_state.session_id = uuid.uuid4().hex
 
 # ============================================================
 # Layout - Responsive columns
@@ -620,10 +644,16 @@ with col2:
     if user_input := st.chat_input("Type your message..."):
         # Add user message
         st.session_state.messages.append({"role": "user", "content": user_input})
-        
-        # Get bot response
-        with st.spinner("🤔 Thinking..."):
-            response = get_bot_response(user_input)
+        with chat_container:
+            with st.chat_message("user", avatar="👤"):
+                st.markdown(user_input)
+    
+    # Answer the latest user message (typed or from a suggestion button), streaming it in place
+    if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
+        query = st.session_state.messages[-1]["content"]
+        with chat_container:
+            with st.chat_message("assistant", avatar="🤖"):
+                response = st.write_stream(stream_bot_response(query))
         
         # Add bot response
         st.session_state.messages.append({"role": "assistant", "content": response})